@@ -0,0 +1,79 @@
+"""
+Benchmark how `correct_time_points` scales with the number of rows and patients,
+against the original groupby/apply implementation.
+
+Run with `make benchmark`, or `python tests/benchmark_correct_time_points.py`.
+The original implementation is skipped above `--max-reference-rows` rows.
+"""
+
+# %%
+import argparse
+import time
+import warnings
+
+import pandas as pd
+from test_data_cleaning import correct_time_points_reference, random_visits
+
+from tm_vctoolbox.data_cleaning import correct_time_points
+
+SIZES = [
+    (1_000, 100),
+    (10_000, 1_000),
+    (100_000, 10_000),
+    (1_000_000, 100_000),
+]
+
+
+# %%
+def best_of(func, df, repeat: int) -> float:
+    """
+    Return the fastest of `repeat` runs of `func(df)`, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(max_reference_rows: int, repeat: int = 3) -> pd.DataFrame:
+    """
+    Time both implementations on random frames of every size in `SIZES`.
+    """
+    rows = []
+    for n_rows, n_patients in SIZES:
+        df = random_visits(0, n_rows, n_patients)
+        vectorized = best_of(correct_time_points, df, repeat)
+        reference = None
+        if n_rows <= max_reference_rows:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", FutureWarning)
+                reference = best_of(correct_time_points_reference, df, 1)
+        rows.append(
+            {
+                "rows": n_rows,
+                "patients": n_patients,
+                "groupby_apply_s": reference,
+                "vectorized_s": vectorized,
+            }
+        )
+        print(rows[-1])
+    return pd.DataFrame(rows).assign(
+        speedup=lambda t: t["groupby_apply_s"] / t["vectorized_s"]
+    )
+
+
+# %%
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--max-reference-rows",
+        type=int,
+        default=100_000,
+        help="largest frame to run the original implementation on",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing")
+    args = parser.parse_args()
+
+    print(run_benchmark(args.max_reference_rows, args.repeat).to_string(index=False))
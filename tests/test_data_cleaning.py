@@ -0,0 +1,322 @@
+"""
+Tests for `tm_vctoolbox.data_cleaning`.
+
+`correct_time_points` is checked against a frozen copy of the original groupby/apply
+implementation on randomized frames.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tm_vctoolbox.data_cleaning import (
+    DEFAULT_VISIT_RULES,
+    CleaningPipeline,
+    VisitRules,
+    compile_visit_rules,
+    correct_time_points,
+    time_point_state,
+    update_time_points,
+)
+
+VISITS = ["SCREENING", "C1D1", "C2D1", "C3D1", "C4D1", "EOT", "FU", None]
+CATEGORIES = ["Pre", "On", "End", "Other", "NA", None, np.nan]
+
+
+def correct_time_points_reference(
+    df,
+    patient_id_col="Patient_ID",
+    visit_name_col="Visit_name",
+    treatment_cat_col="Treatment_Category",
+):
+    """
+    The original groupby/apply implementation of `correct_time_points`, kept unchanged.
+    """
+    df = df.copy()
+
+    def assign_group(group):
+        # Convert "NA" string to pd.NA in treatment category column
+        group[treatment_cat_col] = group[treatment_cat_col].replace("NA", pd.NA)
+
+        # Check if categories already assigned anywhere in the group
+        has_pre = group[treatment_cat_col].eq("Pre").any()
+        has_on = group[treatment_cat_col].eq("On").any()
+        has_end = group[treatment_cat_col].eq("End").any()
+
+        def assign_row(row):
+            vn = row[visit_name_col]
+            tc = row[treatment_cat_col]
+
+            if pd.isna(tc):
+                if vn in ["C1D1", "SCREENING"] and not has_pre:
+                    return "Pre"
+                elif vn in ["C2D1", "C3D1"] and not has_on:
+                    return "On"
+                elif vn == "EOT" and not has_end:
+                    return "End"
+                else:
+                    return pd.NA
+            else:
+                return tc
+
+        group[treatment_cat_col] = group.apply(assign_row, axis=1)
+        return group
+
+    return df.groupby(patient_id_col, group_keys=False).apply(assign_group)
+
+
+def random_visits(seed: int, n_rows: int, n_patients: int) -> pd.DataFrame:
+    """
+    A frame of random visits, with missing patient ids, visit names and categories.
+    """
+    rng = np.random.default_rng(seed)
+    patients = rng.integers(0, n_patients, n_rows).astype(object)
+    patients[rng.random(n_rows) < 0.05] = None
+    return pd.DataFrame(
+        {
+            "Patient_ID": patients,
+            "Visit_name": rng.choice(np.array(VISITS, dtype=object), n_rows),
+            "Treatment_Category": rng.choice(
+                np.array(CATEGORIES, dtype=object), n_rows
+            ),
+            "Value": rng.random(n_rows),
+        },
+        index=rng.permutation(n_rows) + 100,
+    )
+
+
+def assert_same_time_points(result: pd.DataFrame, expected: pd.DataFrame):
+    # The reference can leave np.nan/None next to pd.NA for missing categories
+    def normalize(df):
+        categories = df["Treatment_Category"].astype(object)
+        return df.assign(Treatment_Category=categories.where(categories.notna(), pd.NA))
+
+    pd.testing.assert_frame_equal(normalize(result), normalize(expected))
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("n_rows,n_patients", [(1, 1), (30, 5), (500, 40), (500, 500)])
+def test_correct_time_points_matches_reference(seed, n_rows, n_patients):
+    df = random_visits(seed, n_rows, n_patients)
+    if df["Patient_ID"].isna().all():
+        pytest.skip("groupby().apply on no groups doesn't return the input columns")
+    original = df.copy()
+
+    result = correct_time_points(df)
+    expected = correct_time_points_reference(df)
+
+    pd.testing.assert_frame_equal(df, original)
+    assert_same_time_points(result, expected)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_correct_time_points_custom_columns():
+    df = random_visits(0, 200, 20).rename(
+        columns={"Patient_ID": "pid", "Visit_name": "visit", "Treatment_Category": "tc"}
+    )
+    result = correct_time_points(
+        df, patient_id_col="pid", visit_name_col="visit", treatment_cat_col="tc"
+    )
+    expected = correct_time_points_reference(
+        df, patient_id_col="pid", visit_name_col="visit", treatment_cat_col="tc"
+    )
+    rename = {"pid": "Patient_ID", "visit": "Visit_name", "tc": "Treatment_Category"}
+    assert_same_time_points(
+        result.rename(columns=rename), expected.rename(columns=rename)
+    )
+
+
+def test_correct_time_points_in_place():
+    df = random_visits(1, 50, 5).dropna(subset=["Patient_ID"])
+    result = correct_time_points(df, copy=False)
+    assert result is df
+
+
+def rule_ranks(rules: VisitRules, visits) -> dict:
+    """
+    The finite ranks of each visit, as {visit: {category: rank}}.
+    """
+    return {
+        visit: {
+            cat: rank
+            for cat, rank in zip(rules.categories, row, strict=True)
+            if np.isfinite(rank)
+        }
+        for visit, row in zip(visits, rules.lookup(visits), strict=True)
+    }
+
+
+def test_compile_visit_rules_from_list_precedence_dict():
+    rules = compile_visit_rules({"C1D1": "Pre", "C2D1": ["On", "End"], "EOT": ["End"]})
+
+    assert rule_ranks(rules, ["C1D1", "C2D1", "EOT", "FU"]) == {
+        "C1D1": {"Pre": 0},
+        "C2D1": {"On": 0, "End": 1},
+        "EOT": {"End": 0},
+        "FU": {},
+    }
+    assert compile_visit_rules(rules) is rules
+
+
+def test_compile_visit_rules_from_dataframe():
+    table = pd.DataFrame(
+        {
+            "visit": ["C1D1", "C2D1", "C2D1", "EOT"],
+            "category": ["Pre", "On", "End", "End"],
+        }
+    )
+
+    rules = compile_visit_rules(table)
+
+    # Without a precedence column, row order decides
+    assert rule_ranks(rules, ["C1D1", "C2D1", "EOT"]) == {
+        "C1D1": {"Pre": 0},
+        "C2D1": {"On": 1, "End": 2},
+        "EOT": {"End": 3},
+    }
+    df = random_visits(5, 300, 30)
+    assert_same_time_points(
+        correct_time_points(df, visit_rules=table),
+        correct_time_points(
+            df, visit_rules={"C1D1": "Pre", "C2D1": ["On", "End"], "EOT": "End"}
+        ),
+    )
+
+
+def test_compile_visit_rules_precedence_column():
+    table = pd.DataFrame(
+        {
+            "visit": ["C2D1", "C2D1", "C3D1"],
+            "category": ["On", "End", "On"],
+            "precedence": [5, 1, 0],
+        }
+    )
+
+    rules = compile_visit_rules(table)
+
+    assert rule_ranks(rules, ["C2D1", "C3D1"]) == {
+        "C2D1": {"On": 5, "End": 1},
+        "C3D1": {"On": 0},
+    }
+    # "End" now wins over "On" for C2D1
+    df = pd.DataFrame(
+        {
+            "Patient_ID": ["P1", "P1"],
+            "Visit_name": ["C2D1", "C3D1"],
+            "Treatment_Category": [pd.NA, pd.NA],
+        }
+    )
+    result = correct_time_points(df, visit_rules=table)
+    assert result["Treatment_Category"].tolist() == ["End", "On"]
+
+
+@pytest.mark.parametrize(
+    "rules,match",
+    [
+        ({}, "at least one rule"),
+        (pd.DataFrame({"visit": [], "category": []}), "at least one rule"),
+        ({"C1D1": []}, "at least one rule"),
+        ({"C1D1": None}, "missing values"),
+        ({"C1D1": ["Pre", np.nan]}, "missing values"),
+        (pd.DataFrame({"visit": [None], "category": ["Pre"]}), "missing values"),
+        (
+            pd.DataFrame(
+                {"visit": ["C1D1"], "category": ["Pre"], "precedence": [None]}
+            ),
+            "missing values",
+        ),
+        ({"C1D1": ["Pre", "Pre"]}, "duplicate"),
+        (
+            pd.DataFrame({"visit": ["C1D1", "C1D1"], "category": ["Pre", "Pre"]}),
+            "duplicate",
+        ),
+        (pd.DataFrame({"visit": ["C1D1"]}), "missing columns"),
+    ],
+)
+def test_compile_visit_rules_rejects_invalid_rules(rules, match):
+    with pytest.raises(ValueError, match=match):
+        compile_visit_rules(rules)
+
+
+def test_compile_visit_rules_default():
+    rules = compile_visit_rules(DEFAULT_VISIT_RULES)
+    assert rule_ranks(rules, list(DEFAULT_VISIT_RULES)) == {
+        visit: {cat: 0} for visit, cat in DEFAULT_VISIT_RULES.items()
+    }
+
+
+def random_delta(seed: int, source: pd.DataFrame, n_rows: int, n_patients: int):
+    """
+    Random source rows that either replace a row of `source` or are new.
+    """
+    rng = np.random.default_rng(seed)
+    delta = random_visits(seed + 1000, n_rows, n_patients)
+    n_changed = rng.integers(0, min(n_rows, len(source)) + 1)
+    new_labels = source.index.max() + 1 + np.arange(n_rows - n_changed)
+    changed_labels = rng.choice(source.index.to_numpy(), n_changed, replace=False)
+    delta.index = np.concatenate([changed_labels, new_labels])
+    return delta
+
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("n_rows,n_patients", [(30, 5), (300, 40), (300, 300)])
+def test_update_time_points_matches_full_recompute(seed, n_rows, n_patients):
+    source = random_visits(seed, n_rows, n_patients)
+    result = correct_time_points(source)
+    state = time_point_state(source)
+
+    for step in range(3):
+        delta = random_delta(seed * 10 + step, source, n_rows // 10 + 1, n_patients)
+        previous, before = result, result.copy()
+        result, state = update_time_points(result, delta, state)
+        pd.testing.assert_frame_equal(previous, before)
+        kept = before.index.intersection(result.index, sort=False)
+        # Existing rows keep their order, new rows are appended
+        assert result.index[: len(kept)].equals(kept)
+
+        source = pd.concat([source.drop(delta.index, errors="ignore"), delta])
+        expected = correct_time_points(source)
+        assert_same_time_points(result.sort_index(), expected.sort_index())
+        pd.testing.assert_frame_equal(
+            state.sort_index(), time_point_state(source).sort_index()
+        )
+
+
+def test_update_time_points_in_place():
+    source = random_visits(3, 100, 10).dropna(subset=["Patient_ID"])
+    previous = correct_time_points(source)
+    state = time_point_state(source)
+    delta = source.iloc[:5].assign(Treatment_Category=pd.NA)
+
+    result, _ = update_time_points(previous, delta, state, copy=False)
+
+    assert result is previous
+    expected = correct_time_points(pd.concat([delta, source.iloc[5:]]))
+    assert_same_time_points(result, expected.loc[result.index])
+
+
+def test_cleaning_pipeline_rejects_non_dataframe_steps():
+    df = random_visits(2, 20, 4).dropna(subset=["Patient_ID"])
+    pipeline = CleaningPipeline(df, lazy=True).pipe(lambda d: d["Value"])
+    with pytest.raises(TypeError, match="expected a DataFrame or None"):
+        pipeline.collect()
+
+
+def test_cleaning_pipeline_drops_failing_eager_step():
+    calls = []
+
+    def failing_step(df):
+        calls.append(len(calls))
+        df["Value"] = 0.0
+        raise RuntimeError("step failed")
+
+    df = random_visits(4, 20, 4).dropna(subset=["Patient_ID"])
+    pipeline = CleaningPipeline(df)
+    with pytest.raises(RuntimeError, match="step failed"):
+        pipeline.pipe(failing_step)
+    pipeline.pipe(correct_time_points)
+
+    assert calls == [0]
+    assert [func for func, _, _ in pipeline.steps] == [correct_time_points]
+    assert pipeline._n_run == 1
@@ -0,0 +1,510 @@
+"""
+Tests for the pure Python parts of `tm_vctoolbox.utils_rpy2`.
+
+R isn't needed: the few rpy2 objects these code paths touch (`NA_Character`, `nrow`)
+are replaced with stand-ins, and R data.frames are played by pandas DataFrames.
+"""
+
+import os
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tm_vctoolbox import utils_rpy2
+
+
+class _NACharacter(str):
+    """Stand-in for rpy2's NA_Character singleton, which is a str subclass."""
+
+
+NA_CHARACTER = _NACharacter("NA_character_")
+
+
+@pytest.fixture(autouse=True)
+def fake_rpy2(monkeypatch):
+    monkeypatch.setattr(
+        utils_rpy2, "ro", types.SimpleNamespace(NA_Character=NA_CHARACTER)
+    )
+    monkeypatch.setattr(
+        utils_rpy2,
+        "robjects",
+        types.SimpleNamespace(r={"nrow": lambda df: [len(df)]}.__getitem__),
+    )
+
+
+# %%
+# call_iter
+def fake_runner(schemas=None) -> utils_rpy2.RScriptRunner:
+    """
+    An RScriptRunner whose R function returns `r_df` without sourcing any R script.
+    """
+    runner = object.__new__(utils_rpy2.RScriptRunner)
+    runner.script_path = utils_rpy2.Path("/scripts/pull.R")
+    runner.hot_reload = False
+    runner.backend = "arrow"
+    runner.schemas = schemas
+    runner._call_r = lambda function_name, args, kwargs: kwargs["r_df"]
+    return runner
+
+
+def r_table() -> tuple[pd.DataFrame, tuple]:
+    """
+    A 'data.frame' whose NAs are all in its second half, and its R column info.
+    """
+    half = [None] * 4
+    r_df = pd.DataFrame(
+        {
+            "int": pd.array([1, 2, 3, 4] + half, dtype="Int32"),
+            "lgl": pd.array([True, False, True, False] + half, dtype="boolean"),
+            "chr": ["a", "b", "c", "d"] + half,
+            "dbl": [0.5] * 8,
+        }
+    )
+    classes = ["integer", "logical", "character", "numeric"]
+    return r_df, (classes, [True, True, True, False])
+
+
+def arrow_slices(monkeypatch, column_info):
+    """
+    Convert row slices of the fake data.frame with the Arrow backend's conversion.
+    """
+    import pyarrow as pa
+
+    monkeypatch.setattr(utils_rpy2, "_is_r_dataframe", lambda obj: True)
+    monkeypatch.setattr(utils_rpy2, "_r_column_info", lambda r_df: column_info)
+    monkeypatch.setattr(
+        utils_rpy2,
+        "_get_r_slice_rows",
+        lambda: lambda df, start, stop: df.iloc[start - 1 : stop],
+    )
+
+    def to_pandas(r_slice, info):
+        # R's arrow package writes no pandas metadata
+        table = pa.Table.from_pandas(r_slice, preserve_index=False)
+        table = table.replace_schema_metadata(None)
+        return utils_rpy2._arrow_table_to_pandas(table, *info)
+
+    monkeypatch.setattr(utils_rpy2, "r_dataframe_to_pandas_arrow", to_pandas)
+
+
+def test_call_iter_chunks_share_dtypes(monkeypatch, tmp_path, capsys):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    r_df, column_info = r_table()
+    arrow_slices(monkeypatch, column_info)
+    schemas = utils_rpy2.SchemaRegistry(tmp_path / "schemas")
+    runner = fake_runner(schemas)
+
+    chunks = list(runner.call_iter("pull", chunksize=4, r_df=r_df))
+
+    assert [len(chunk) for chunk in chunks] == [4, 4]
+    pd.testing.assert_series_equal(chunks[0].dtypes, chunks[1].dtypes)
+    assert chunks[0].dtypes.to_dict() == {
+        "int": np.float64,
+        "lgl": object,
+        "chr": object,
+        "dbl": np.float64,
+    }
+    assert chunks[1]["int"].isna().all() and chunks[1]["lgl"].isna().all()
+    assert chunks[1].index.tolist() == [4, 5, 6, 7]
+    assert "Warning" not in capsys.readouterr().out
+    assert schemas.get(runner.script_path, "pull") is not None
+
+    # Streaming into Parquet as in example_rscript_runner.py
+    schema = pa.Table.from_pandas(chunks[0], preserve_index=False).schema
+    with pq.ParquetWriter(tmp_path / "pull.parquet", schema) as writer:
+        for chunk in chunks:
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+    assert pq.read_table(tmp_path / "pull.parquet").num_rows == 8
+
+
+def test_call_iter_uses_stored_schema_without_drift(monkeypatch, tmp_path, capsys):
+    r_df, column_info = r_table()
+    arrow_slices(monkeypatch, column_info)
+    schemas = utils_rpy2.SchemaRegistry(tmp_path / "schemas", on_drift="raise")
+    runner = fake_runner(schemas)
+
+    first = list(runner.call_iter("pull", chunksize=4, r_df=r_df))
+    second = list(runner.call_iter("pull", chunksize=3, r_df=r_df))
+
+    assert {str(chunk.dtypes.to_dict()) for chunk in first + second} == {
+        str(first[0].dtypes.to_dict())
+    }
+    assert "Warning" not in capsys.readouterr().out
+
+
+def test_pandas2ri_slices_share_dtypes():
+    # Row slices as pandas2ri converts them: only the second one holds the NAs
+    na_int = utils_rpy2._R_NA_INTEGER
+    slices = [
+        pd.DataFrame(
+            {
+                "int": np.array([1, 2], dtype=np.int32),
+                "lgl": np.array([True, False]),
+                "i64": np.array([5, 6], dtype=np.int64),
+            }
+        ),
+        pd.DataFrame(
+            {
+                "int": np.array([3, na_int], dtype=np.int32),
+                "lgl": np.array([1, na_int], dtype=np.int32),
+                "i64": np.array([7.0, np.nan]),
+            }
+        ),
+    ]
+    classes, any_na = ["integer", "logical", "integer64"], [True, True, True]
+
+    processed = []
+    for df in slices:
+        utils_rpy2._harmonize_r_na_columns(df, classes, any_na)
+        utils_rpy2._attach_r_column_info(df, classes, any_na)
+        processed.append(utils_rpy2.postprocess_r_dataframe(df))
+
+    pd.testing.assert_series_equal(processed[0].dtypes, processed[1].dtypes)
+    assert processed[1]["lgl"].tolist()[0] is True
+    assert processed[1].isna().sum().tolist() == [1, 1, 1]
+
+
+# %%
+# postprocess_r_dataframe
+def four_pass_postprocess(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The post-processing steps `postprocess_r_dataframe` replaces, run in turn.
+    """
+    df = utils_rpy2.fix_r_dataframe_types(df)
+    df = utils_rpy2.fix_string_nans(df)
+    df = utils_rpy2.normalize_single_df_dtypes(df, sample_size=None)
+    return utils_rpy2.replace_r_na(df)
+
+
+NA_INT = utils_rpy2._R_NA_INTEGER
+
+POSTPROCESS_CASES = {
+    "na_sentinel": {
+        "int": np.array([1, NA_INT, 3], dtype=np.int32),
+        "int_no_na": np.array([1, 2, 3], dtype=np.int32),
+    },
+    "date_range": {
+        "days": [18000.0, np.nan, 19000.0],
+        "int_days": np.array([18000, 19000, 20000], dtype=np.int32),
+        "out_of_range": [9999.0, 18000.0, 19000.0],
+    },
+    "tz_datetimes": {
+        "posixct": pd.date_range("2024-03-30", periods=3, freq="D", tz="Europe/Paris"),
+        "naive": pd.date_range("2024-03-30", periods=3, freq="D"),
+    },
+    "categoricals": {
+        "factor": pd.Categorical(["a", "NA", "b"]),
+        "factor_na_character": pd.Categorical(["a", NA_CHARACTER, "b"]),
+    },
+    "na_strings": {
+        "text": ["a", "NA", ""],
+        "numbers": ["1.5", "nan", "2"],
+        "mostly_numbers": ["1", "2", "x"],
+        "all_na": ["na", "NaN", ""],
+    },
+    "na_character": {
+        "text": ["a", NA_CHARACTER, "b"],
+        "numbers": ["1", NA_CHARACTER, "3"],
+        "mixed": [NA_CHARACTER, "NA", "c"],
+    },
+}
+
+
+# The four passes use pandas calls deprecated for these dtypes
+@pytest.mark.filterwarnings("ignore::DeprecationWarning", "ignore::FutureWarning")
+@pytest.mark.parametrize("case", POSTPROCESS_CASES)
+def test_postprocess_r_dataframe_matches_four_passes(case):
+    df = pd.DataFrame(POSTPROCESS_CASES[case])
+
+    fused = utils_rpy2.postprocess_r_dataframe(df.copy(deep=True), sample_size=None)
+    expected = four_pass_postprocess(df.copy(deep=True))
+
+    pd.testing.assert_frame_equal(fused, expected)
+
+
+# %%
+# _coerce_mostly_numeric
+def text_column(n: int, numeric_share: float, seed: int = 0) -> pd.Series:
+    """
+    An object column of `n` values, a `numeric_share` of which are numbers, shuffled.
+    """
+    n_numeric = round(n * numeric_share)
+    values = [str(i) for i in range(n_numeric)] + [
+        f"id{i}" for i in range(n - n_numeric)
+    ]
+    return pd.Series(np.random.default_rng(seed).permutation(np.array(values, object)))
+
+
+@pytest.fixture
+def to_numeric_lengths(monkeypatch):
+    """
+    The lengths of the inputs of every `pd.to_numeric` call.
+    """
+    lengths = []
+    to_numeric = pd.to_numeric
+
+    def spy(arg, *args, **kwargs):
+        lengths.append(len(arg))
+        return to_numeric(arg, *args, **kwargs)
+
+    monkeypatch.setattr(pd, "to_numeric", spy)
+    return lengths
+
+
+def test_coerce_mostly_numeric_rejects_text_on_sample(to_numeric_lengths):
+    series = text_column(20_000, 0.02)
+
+    assert utils_rpy2._coerce_mostly_numeric(series, sample_size=1000) is None
+    assert to_numeric_lengths == [1000]
+
+
+@pytest.mark.parametrize("numeric_share", [0.47, 0.5, 0.53])
+def test_coerce_mostly_numeric_decides_near_threshold_on_full_column(
+    to_numeric_lengths, numeric_share
+):
+    series = text_column(20_000, numeric_share)
+
+    coerced = utils_rpy2._coerce_mostly_numeric(series, sample_size=1000)
+
+    assert to_numeric_lengths == [1000, 20_000]
+    if numeric_share < 0.5:
+        assert coerced is None
+    else:
+        pd.testing.assert_series_equal(
+            coerced, pd.to_numeric(series, errors="coerce"), check_names=False
+        )
+
+
+@pytest.mark.parametrize("numeric_share", [0.02, 0.9])
+def test_coerce_mostly_numeric_without_sample(to_numeric_lengths, numeric_share):
+    series = text_column(20_000, numeric_share)
+    series[::7] = None
+
+    coerced = utils_rpy2._coerce_mostly_numeric(series, sample_size=None)
+
+    assert to_numeric_lengths == [20_000]
+    if numeric_share < 0.5:
+        assert coerced is None
+    else:
+        assert coerced.notna().sum() == series.dropna().str.isdigit().sum()
+
+
+def test_coerce_mostly_numeric_small_column_skips_sample(to_numeric_lengths):
+    series = text_column(500, 0.02)
+
+    assert utils_rpy2._coerce_mostly_numeric(series, sample_size=1000) is None
+    assert to_numeric_lengths == [500]
+
+
+# %%
+# ResultCache
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    A settable stand-in for `time.monotonic`.
+    """
+    now = [0.0]
+    monkeypatch.setattr(utils_rpy2.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = utils_rpy2.ResultCache(maxsize=2)
+    cache.set(("a.R", "f", 1), "one")
+    cache.set(("a.R", "f", 2), "two")
+    assert cache.get(("a.R", "f", 1)) == "one"
+
+    cache.set(("a.R", "f", 3), "three")
+
+    assert len(cache) == 2
+    assert cache.get(("a.R", "f", 2)) is utils_rpy2._CACHE_MISS
+    assert cache.get(("a.R", "f", 1)) == "one"
+    assert cache.get(("a.R", "f", 3)) == "three"
+
+
+def test_result_cache_expires_entries(clock):
+    cache = utils_rpy2.ResultCache(ttl=10)
+    cache.set(("a.R", "f"), "old")
+    clock[0] = 5.0
+    cache.set(("a.R", "g"), "new")
+
+    clock[0] = 10.0
+    assert cache.get(("a.R", "f")) == "old"
+    clock[0] = 10.5
+    assert cache.get(("a.R", "f")) is utils_rpy2._CACHE_MISS
+    assert cache.get(("a.R", "g")) == "new"
+    assert len(cache) == 1
+
+
+def test_result_cache_invalidate():
+    cache = utils_rpy2.ResultCache()
+    for key in [("a.R", "f", 1), ("a.R", "g", 1), ("b.R", "f", 1)]:
+        cache.set(key, key)
+
+    cache.invalidate("f", script_path=utils_rpy2.Path("a.R"))
+    assert len(cache) == 2
+    cache.invalidate("f")
+    assert cache.get(("a.R", "g", 1)) == ("a.R", "g", 1)
+    cache.clear()
+    assert len(cache) == 0
+
+    with pytest.raises(ValueError, match="maxsize"):
+        utils_rpy2.ResultCache(maxsize=0)
+
+
+# %%
+# DiskResultStore
+def stored_result() -> dict:
+    return {
+        "frame": pd.DataFrame(
+            {
+                "int": np.arange(4),
+                "float": [0.5, np.nan, 1.5, 2.0],
+                "str": ["a", np.nan, "c", "d"],
+                "date": pd.date_range("2024-01-01", periods=4),
+                "bool": [True, False, True, True],
+            }
+        ),
+        "unnamed": pd.Series([1.0, 2.0, np.nan]),
+        "named": pd.Series(["x", np.nan], name="visit"),
+        "int_named": pd.Series([1, 2], name=np.int64(3)),
+        "array": np.array([1.5, 2.5]),
+        "strings": np.array(["a", None], dtype=object),
+        "values": [1, "a", None, 2.5, True, np.int64(7)],
+    }
+
+
+def assert_same_result(result, expected):
+    assert result.keys() == expected.keys()
+    pd.testing.assert_frame_equal(result["frame"], expected["frame"])
+    for key in ["unnamed", "named"]:
+        pd.testing.assert_series_equal(result[key], expected[key])
+    pd.testing.assert_series_equal(
+        result["int_named"], expected["int_named"], check_names=False
+    )
+    assert result["int_named"].name == 3
+    np.testing.assert_array_equal(result["array"], expected["array"])
+    assert result["strings"][0] == "a" and pd.isna(result["strings"][1])
+    assert result["values"] == [1, "a", None, 2.5, True, 7]
+
+
+@pytest.mark.parametrize("zero_copy", [False, True])
+def test_disk_result_store_round_trip(tmp_path, zero_copy):
+    store = utils_rpy2.DiskResultStore(tmp_path / "store", zero_copy=zero_copy)
+    calls = []
+
+    def call():
+        calls.append(1)
+        return stored_result()
+
+    first = store.get_or_call(("/scripts/a.R", "f", 1), call)
+    second = store.get_or_call(("/scripts/a.R", "f", 1), call)
+
+    assert len(calls) == 1
+    assert_same_result(first, stored_result())
+    assert_same_result(second, stored_result())
+
+
+def test_disk_result_store_returns_unstorable_results(tmp_path, capsys):
+    store = utils_rpy2.DiskResultStore(tmp_path / "store")
+    calls = []
+
+    def call():
+        calls.append(1)
+        return {"r_object": object()}
+
+    for _ in range(2):
+        store.get_or_call(("/scripts/a.R", "f"), call)
+
+    assert len(calls) == 2
+    assert store.size() == 0
+    assert "not written to disk store" in capsys.readouterr().out
+
+
+def test_disk_result_store_evicts_and_invalidates(tmp_path):
+    frame = pd.DataFrame({"x": np.arange(1000, dtype=np.float64)})
+    store = utils_rpy2.DiskResultStore(tmp_path / "store")
+    keys = [("/scripts/a.R", "f"), ("/scripts/a.R", "g"), ("/scripts/b.R", "g")]
+    for last_used, key in enumerate(keys):
+        store.get_or_call(key, lambda: frame)
+        digest = utils_rpy2._stable_hash(key)
+        os.utime(store.root / digest[:2] / digest / store._MANIFEST, (last_used,) * 2)
+    entry_size = store.size() // 3
+
+    # Reading an entry marks it as recently used, so "g" of a.R is now evicted first
+    pd.testing.assert_frame_equal(store.get(utils_rpy2._stable_hash(keys[0])), frame)
+    store.max_bytes = int(entry_size * 2.5)
+    store._evict()
+    assert sorted(
+        m["function_name"] + m["script_path"] for _, m in store._entries()
+    ) == [
+        "f/scripts/a.R",
+        "g/scripts/b.R",
+    ]
+
+    store.invalidate("g", script_path="/scripts/a.R")
+    assert store.size() == 2 * entry_size
+    store.invalidate("g")
+    assert [m["function_name"] for _, m in store._entries()] == ["f"]
+    store.clear()
+    assert store.size() == 0
+
+
+# %%
+# concat_r_frames
+def test_concat_r_frames_keeps_one_dtype_per_column():
+    frames = [
+        pd.DataFrame(
+            {
+                "id": np.array([1, 2], dtype=np.int32),
+                "flag": [True, False],
+                "site": pd.Categorical(["a", "b"]),
+                "value": [0.5, 1.5],
+            }
+        ),
+        # A study where R handed "value" over as all-NA logical and "site" as character
+        pd.DataFrame(
+            {
+                "id": np.array([3], dtype=np.int64),
+                "value": [np.nan],
+                "site": pd.Categorical(["c"]),
+                "extra": ["x"],
+            }
+        ),
+    ]
+
+    combined = utils_rpy2.concat_r_frames(frames)
+
+    assert combined.columns.tolist() == ["id", "flag", "site", "value", "extra"]
+    assert combined.dtypes.to_dict() == {
+        "id": np.int64,
+        "flag": object,
+        "site": "category",
+        "value": np.float64,
+        "extra": object,
+    }
+    assert combined["site"].cat.categories.tolist() == ["a", "b", "c"]
+    assert combined["flag"].tolist()[:2] == [True, False]
+    assert combined["flag"].isna().tolist() == [False, False, True]
+    assert combined["value"].tolist()[:2] == [0.5, 1.5]
+    assert combined.index.tolist() == [0, 1, 2]
+
+
+def test_concat_r_frames_all_na_column_takes_other_dtype():
+    frames = [
+        pd.DataFrame({"date": pd.to_datetime(["2024-01-01", "2024-02-01"])}),
+        pd.DataFrame({"date": pd.Series([None, None], dtype=object)}),
+        pd.DataFrame({"date": np.array([np.nan])}),
+    ]
+
+    combined = utils_rpy2.concat_r_frames(frames)
+
+    assert combined["date"].dtype == "datetime64[ns]"
+    assert combined["date"].isna().tolist() == [False, False, True, True, True]
+    assert utils_rpy2.concat_r_frames([]).empty
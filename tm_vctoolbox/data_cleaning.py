@@ -2,9 +2,139 @@
 This module contains functions for cleaning and standardizing data
 """
 
-# %%np
+# %%
+import inspect
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
+# %%
+# Default visit name -> treatment category rules used by `correct_time_points`
+DEFAULT_VISIT_RULES = {
+    "C1D1": "Pre",
+    "SCREENING": "Pre",
+    "C2D1": "On",
+    "C3D1": "On",
+    "EOT": "End",
+}
+
+
+# %%
+@dataclass(frozen=True)
+class VisitRules:
+    """
+    Visit name -> treatment category rules compiled into lookup arrays.
+
+    Build with `compile_visit_rules` rather than directly.
+    - `visits`: the visit names that have at least one rule.
+    - `categories`: the treatment categories the rules can assign.
+    - `ranks`: array of shape (len(visits) + 1, len(categories)). `ranks[i, j]` is the
+      precedence of category j for visit i (lower wins), or inf if visit i never maps to
+      category j. The extra last row is all inf and catches visits without a rule.
+    """
+
+    visits: pd.Index
+    categories: pd.Index
+    ranks: np.ndarray
+
+    def lookup(self, visit_names) -> np.ndarray:
+        """
+        Return the rank rows for an array of visit names, one row per visit.
+        """
+        # Categorical codes are -1 for visits without a rule, i.e. the all-inf last row
+        codes = pd.Categorical(visit_names, categories=self.visits).codes
+        return self.ranks[codes]
+
+
+# %%
+def compile_visit_rules(rules) -> VisitRules:
+    """
+    Compile a visit rule table into a `VisitRules` lookup.
+
+    Parameters
+    ----------
+    rules : dict, pandas.DataFrame or VisitRules
+        - dict mapping visit name -> category, or visit name -> list of categories in
+          order of precedence (e.g. {"C1D1": "Pre", "C2D1": ["On", "End"]}).
+        - DataFrame with columns "visit" and "category", and optionally "precedence"
+          (lower wins). Without a "precedence" column, row order is used.
+        - An already compiled VisitRules, which is returned unchanged.
+
+    Returns
+    -------
+    VisitRules
+        The compiled rules.
+
+    Raises
+    ------
+    ValueError
+        If the rules are empty, contain missing values or repeat a (visit, category) pair.
+    """
+    if isinstance(rules, VisitRules):
+        return rules
+
+    if isinstance(rules, pd.DataFrame):
+        missing_cols = {"visit", "category"} - set(rules.columns)
+        if missing_cols:
+            raise ValueError(f"Rule table is missing columns: {sorted(missing_cols)}")
+        table = pd.DataFrame(
+            {
+                "visit": rules["visit"].to_numpy(),
+                "category": rules["category"].to_numpy(),
+                "precedence": (
+                    rules["precedence"].to_numpy()
+                    if "precedence" in rules.columns
+                    else np.arange(len(rules))
+                ),
+            }
+        )
+    else:
+        rows = []
+        for visit, cats in rules.items():
+            # A single category, possibly missing, is a rule of its own
+            if not isinstance(cats, (list, tuple)):
+                cats = [cats]
+            rows.extend((visit, cat, rank) for rank, cat in enumerate(cats))
+        table = pd.DataFrame(rows, columns=["visit", "category", "precedence"])
+
+    if table.empty:
+        raise ValueError("Visit rules must contain at least one rule.")
+    if table.isna().any(axis=None):
+        raise ValueError("Visit rules must not contain missing values.")
+    if table.duplicated(["visit", "category"]).any():
+        raise ValueError("Visit rules contain duplicate (visit, category) pairs.")
+
+    visits = pd.Index(table["visit"].unique())
+    categories = pd.Index(table["category"].unique())
+    ranks = np.full((len(visits) + 1, len(categories)), np.inf)
+    ranks[
+        visits.get_indexer(table["visit"]), categories.get_indexer(table["category"])
+    ] = table["precedence"].astype("float64")
+    return VisitRules(visits=visits, categories=categories, ranks=ranks)
+
+
+_DEFAULT_COMPILED_RULES = compile_visit_rules(DEFAULT_VISIT_RULES)
+
+
+# %%
+def _category_flags(categories, rules):
+    """
+    Normalize a treatment category column and flag which rule category each row holds.
+
+    Returns the category values as an object array (with "NA" strings and other missing
+    values as pd.NA) and a boolean DataFrame with one column per rule category.
+    """
+    # Convert "NA" string to pd.NA in treatment category column
+    values = categories.replace("NA", pd.NA).to_numpy(dtype=object, na_value=pd.NA)
+    codes = rules.categories.get_indexer(values)
+    flags = pd.DataFrame(
+        codes[:, None] == np.arange(len(rules.categories)),
+        index=categories.index,
+        columns=rules.categories,
+    )
+    return values, flags
+
 
 # %%
 def correct_time_points(
@@ -12,20 +142,27 @@ def correct_time_points(
     patient_id_col="Patient_ID",
     visit_name_col="Visit_name",
     treatment_cat_col="Treatment_Category",
+    visit_rules=None,
+    copy=True,
 ):
     """
     Assign treatment categories ("Pre", "On", "End") to patient visits in a dataframe.
 
     For each patient group (grouped by `patient_id_col`), the function:
     - Converts "NA" strings in the treatment category column to pd.NA.
-    - Checks if categories "Pre", "On", or "End" are already assigned anywhere in the patient group.
+    - Checks which categories are already assigned anywhere in the patient group.
     - For each row with missing category (NaN), assigns category based on the visit name only if
-      that category is not already assigned anywhere in the group:
+      that category is not already assigned anywhere in the group. With the default rules:
         - Visits "C1D1" or "SCREENING" get category "Pre" if no "Pre" assigned yet.
         - Visits "C2D1" or "C3D1" get category "On" if no "On" assigned yet.
         - Visit "EOT" gets category "End" if no "End" assigned yet.
+      If a visit maps to several categories, the highest precedence one not yet assigned wins.
     - Keeps existing categories unchanged.
 
+    The group-level checks and assignments are vectorized (groupby().transform and a compiled
+    rule lookup), so run time scales with the number of rows rather than the number of patient
+    groups. Rows with a missing `patient_id_col` are dropped, as with groupby().
+
     Parameters:
     -----------
     df : pandas.DataFrame
@@ -36,47 +173,268 @@ def correct_time_points(
         Name of the column containing visit names.
     treatment_cat_col : str, default "Treatment_Category"
         Name of the column to assign/update treatment categories.
+    visit_rules : dict, pandas.DataFrame or VisitRules, optional
+        Visit name -> category rules, see `compile_visit_rules`. Defaults to
+        `DEFAULT_VISIT_RULES`. Pass a compiled `VisitRules` to reuse it across calls.
+    copy : bool, default True
+        If False, update `df` in place instead of working on a copy. A new dataframe is still
+        returned when rows without a patient id have to be dropped.
 
     Returns:
     --------
     pandas.DataFrame
-        A copy of the input dataframe with updated treatment categories.
+        The dataframe with updated treatment categories (a copy of the input unless copy=False).
     """
-    df = df.copy()
+    rules = (
+        _DEFAULT_COMPILED_RULES
+        if visit_rules is None
+        else compile_visit_rules(visit_rules)
+    )
 
-    def assign_group(group):
-        # Convert "NA" string to pd.NA in treatment category column
-        group[treatment_cat_col] = group[treatment_cat_col].replace("NA", pd.NA)
+    # groupby() drops rows without a patient id, so do the same here
+    has_patient = df[patient_id_col].notna().to_numpy()
+    if not has_patient.all():
+        df = df.take(np.flatnonzero(has_patient))
+    elif copy:
+        df = df.copy()
 
-        # Check if categories already assigned anywhere in the group
-        has_pre = group[treatment_cat_col].eq("Pre").any()
-        has_on = group[treatment_cat_col].eq("On").any()
-        has_end = group[treatment_cat_col].eq("End").any()
+    values, assigned = _category_flags(df[treatment_cat_col], rules)
 
-        def assign_row(row):
-            vn = row[visit_name_col]
-            tc = row[treatment_cat_col]
+    # Check which rule categories are already assigned anywhere in each patient group
+    has_category = (
+        assigned.groupby(df[patient_id_col].to_numpy(), sort=False)
+        .transform("any")
+        .to_numpy()
+    )
 
-            if pd.isna(tc):
-                if vn in ["C1D1", "SCREENING"] and not has_pre:
-                    return "Pre"
-                elif vn in ["C2D1", "C3D1"] and not has_on:
-                    return "On"
-                elif vn == "EOT" and not has_end:
-                    return "End"
-                else:
-                    return pd.NA
-            else:
-                return tc
+    # Pick the highest precedence category that the group doesn't have yet
+    ranks = np.where(has_category, np.inf, rules.lookup(df[visit_name_col]))
+    best = ranks.argmin(axis=1)
+    assign = pd.isna(values) & np.isfinite(ranks[np.arange(len(ranks)), best])
 
-        group[treatment_cat_col] = group.apply(assign_row, axis=1)
-        return group
+    values[assign] = rules.categories.to_numpy(dtype=object)[best[assign]]
+    df[treatment_cat_col] = values
+    return df
 
-    return df.groupby(patient_id_col, group_keys=False).apply(assign_group)
+
+# %%
+def time_point_state(
+    df,
+    patient_id_col="Patient_ID",
+    treatment_cat_col="Treatment_Category",
+    visit_rules=None,
+):
+    """
+    Build the per-patient state used by `update_time_points`.
+
+    The state records, for each patient, which rule categories (e.g. "Pre", "On", "End") are
+    already present in the source data, i.e. before `correct_time_points` assigns anything.
+    It must be built from the same dataframe that was passed to `correct_time_points`.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Source dataframe, as passed to `correct_time_points`.
+    patient_id_col : str, default "Patient_ID"
+        Name of the column identifying patients.
+    treatment_cat_col : str, default "Treatment_Category"
+        Name of the treatment category column.
+    visit_rules : dict, pandas.DataFrame or VisitRules, optional
+        Visit rules, see `compile_visit_rules`. Defaults to `DEFAULT_VISIT_RULES`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Boolean frame indexed by patient id, with one column per rule category.
+    """
+    rules = (
+        _DEFAULT_COMPILED_RULES
+        if visit_rules is None
+        else compile_visit_rules(visit_rules)
+    )
+    df = df[df[patient_id_col].notna()]
+    _, assigned = _category_flags(df[treatment_cat_col], rules)
+    state = assigned.groupby(df[patient_id_col].to_numpy(), sort=False).any()
+    state.index.name = patient_id_col
+    return state
 
 
 # %%
-def set_plot_indication(df, indication_map, col_name="Indication", default="OTHER"):
+def update_time_points(
+    previous,
+    new_rows,
+    state,
+    patient_id_col="Patient_ID",
+    visit_name_col="Visit_name",
+    treatment_cat_col="Treatment_Category",
+    visit_rules=None,
+    copy=True,
+):
+    """
+    Incrementally refresh the output of `correct_time_points` with new or changed rows.
+
+    Only the patients touched by `new_rows` are recomputed, and their categories are written
+    back by position, so the cost of a refresh scales with the size of the delta rather than
+    the whole history. The result is the same as rerunning `correct_time_points` on the full,
+    updated source data.
+
+    Rows are matched by index label: a row in `new_rows` whose label exists in `previous`
+    replaces that row in place, any other row is appended. Both indexes must be unique.
+
+    Example Usage
+    -------------
+    state = time_point_state(visits_df)
+    corrected_df = correct_time_points(visits_df)
+
+    # later, with the rows added or changed since the last run
+    corrected_df, state = update_time_points(corrected_df, delta_df, state)
+
+    Parameters
+    ----------
+    previous : pandas.DataFrame
+        Previous output of `correct_time_points` (or `update_time_points`).
+    new_rows : pandas.DataFrame
+        New or changed source rows, with the same columns as the source data.
+    state : pandas.DataFrame
+        Per-patient state from `time_point_state` or the previous `update_time_points`.
+    patient_id_col, visit_name_col, treatment_cat_col, visit_rules :
+        As for `correct_time_points`. Must match the ones used to build `previous`.
+    copy : bool, default True
+        If False, update `previous` in place instead of a copy. A new dataframe is still
+        returned when rows are appended or dropped.
+
+    Returns
+    -------
+    tuple[pandas.DataFrame, pandas.DataFrame]
+        The updated dataframe and the updated per-patient state.
+    """
+    rules = (
+        _DEFAULT_COMPILED_RULES
+        if visit_rules is None
+        else compile_visit_rules(visit_rules)
+    )
+    if not state.columns.equals(rules.categories):
+        raise ValueError(
+            "State categories do not match the visit rules: "
+            f"{list(state.columns)} vs {list(rules.categories)}"
+        )
+    if not previous.index.is_unique or not new_rows.index.is_unique:
+        raise ValueError("update_time_points requires unique row indexes.")
+
+    # Work out which patients were touched, including the old patient of a changed row
+    positions = previous.index.get_indexer(new_rows.index)
+    replaced = positions[positions >= 0]
+    patient_ids = previous[patient_id_col]
+    touched = pd.unique(
+        np.concatenate(
+            [
+                new_rows[patient_id_col].dropna().to_numpy(dtype=object),
+                patient_ids.iloc[replaced].to_numpy(dtype=object),
+            ]
+        )
+    )
+    recompute = patient_ids.isin(touched).to_numpy()
+    del patient_ids
+    recompute[replaced] = False
+    old_positions = np.flatnonzero(recompute)
+    old_rows = previous.take(old_positions)
+
+    # Restore the source categories of the touched patients' existing rows: a rule category
+    # that the patient did not have in the source data must have been assigned by the rules
+    values, assigned = _category_flags(old_rows[treatment_cat_col], rules)
+    in_source = (
+        state.reindex(old_rows[patient_id_col].to_numpy(), fill_value=False)
+        .astype(bool)
+        .to_numpy()
+    )
+    values[(assigned.to_numpy() & ~in_source).any(axis=1)] = pd.NA
+    old_rows[treatment_cat_col] = values
+
+    source_rows = pd.concat([old_rows, new_rows])
+    # The state must be taken before the categories are assigned in place below
+    new_state = pd.concat(
+        [
+            state.drop(touched, errors="ignore"),
+            time_point_state(
+                source_rows,
+                patient_id_col=patient_id_col,
+                treatment_cat_col=treatment_cat_col,
+                visit_rules=rules,
+            ),
+        ]
+    )
+    recomputed = correct_time_points(
+        source_rows,
+        patient_id_col=patient_id_col,
+        visit_name_col=visit_name_col,
+        treatment_cat_col=treatment_cat_col,
+        visit_rules=rules,
+        copy=False,
+    )
+
+    result = previous.copy() if copy else previous
+    for column in new_rows.columns.difference(result.columns, sort=False):
+        result[column] = np.nan
+
+    # Write the categories of the touched patients' other rows back by position
+    category_pos = result.columns.get_loc(treatment_cat_col)
+    if not pd.api.types.is_object_dtype(result.dtypes.iloc[category_pos]):
+        result.isetitem(category_pos, result.iloc[:, category_pos].astype(object))
+    result.iloc[old_positions, category_pos] = recomputed[treatment_cat_col].to_numpy(
+        dtype=object
+    )[: len(old_positions)]
+
+    # Overwrite changed rows in place; rows without a patient id were dropped above
+    changed = recomputed.iloc[len(old_positions) :]
+    changed_positions = previous.index.get_indexer(changed.index)
+    in_previous = changed_positions >= 0
+    _write_rows(result, changed_positions[in_previous], changed[in_previous])
+
+    dropped = np.setdiff1d(replaced, changed_positions[in_previous])
+    if len(dropped):
+        result = result.drop(index=previous.index[dropped])
+
+    appended = changed[~in_previous]
+    if len(appended):
+        categories = result[treatment_cat_col].to_numpy(dtype=object)
+        result = pd.concat([result, appended])
+        # concat() turns all-NA object blocks into NaN, so carry the categories over as-is
+        result[treatment_cat_col] = np.concatenate(
+            [categories, appended[treatment_cat_col].to_numpy(dtype=object)]
+        )
+    return result, new_state
+
+
+def _write_rows(df, positions, rows):
+    """
+    Overwrite the rows of `df` at `positions` with the rows of `rows` (labelled like those
+    rows of `df`), in place. Columns that can't hold the new values (e.g. int64 receiving
+    NaN) are upcast first.
+    """
+    if not len(positions):
+        return
+    rows = rows.reindex(columns=df.columns)
+    current = df.take(positions)
+    # Don't hold on to the columns of `df`: pandas copies a column that is still
+    # referenced before writing into it
+    for j, dtype in enumerate(df.dtypes):
+        values = rows.iloc[:, j]
+        # Writing into a column costs a pass over the whole column, so skip unchanged ones
+        if values.equals(current.iloc[:, j]):
+            continue
+        if values.dtype != dtype and not pd.api.types.is_object_dtype(dtype):
+            try:
+                dtype = np.result_type(dtype, values.dtype)
+            except TypeError:
+                dtype = object
+            df.isetitem(j, df.iloc[:, j].astype(dtype))
+        df.iloc[positions, j] = values.to_numpy()
+
+
+# %%
+def set_plot_indication(
+    df, indication_map, col_name="Indication", default="OTHER", copy=True
+):
     """
     Adds a new column 'Plot_Indication' to the DataFrame using a mapping dictionary.
 
@@ -93,6 +451,8 @@ def set_plot_indication(df, indication_map, col_name="Indication", default="OTHE
         Name of the column to map from (default is 'Indication').
     default : str, optional
         Default value for Plot_Indication if the indication is not in the mapping (default is "OTHER").
+    copy : bool, optional
+        If False, add the column to `df` in place instead of to a copy (default is True).
 
     Returns
     -------
@@ -110,9 +470,89 @@ def set_plot_indication(df, indication_map, col_name="Indication", default="OTHE
 
     annotation_df = set_plot_indication(annotation_df, indication_map)
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
     df["Plot_Indication"] = df[col_name].map(indication_map).fillna(default)
     return df
 
 
+# %%
+class CleaningPipeline:
+    """
+    Chain data cleaning steps on a dataframe with a single defensive copy.
+
+    The input dataframe is copied once, and every step then works in place on that working
+    copy, so chaining several steps doesn't copy a wide table once per step. Steps that accept
+    a `copy` argument (e.g. `correct_time_points`, `set_plot_indication`) are called with
+    copy=False. Any other step is called as `func(df, *args, **kwargs)` and must return the
+    cleaned dataframe, or None if it modified `df` in place; anything else raises a TypeError.
+
+    By default each step runs as soon as it is added. With lazy=True, steps are only planned,
+    and the copy and all steps run when `.collect()` is called.
+
+    Example Usage
+    -------------
+    cleaned_df = (
+        CleaningPipeline(visits_df, lazy=True)
+        .pipe(correct_time_points, patient_id_col="Patient_ID")
+        .pipe(set_plot_indication, indication_map)
+        .collect()
+    )
+    """
+
+    def __init__(self, df: pd.DataFrame, lazy: bool = False):
+        """
+        Initialize the pipeline with the dataframe to clean. The input is never modified.
+        """
+        self.lazy = lazy
+        self.steps = []
+        self._source = df
+        self._frame = None if lazy else df.copy()
+        self._n_run = 0
+
+    def pipe(self, func, *args, **kwargs):
+        """
+        Register a cleaning step and return the pipeline, so calls can be chained.
+        The step runs immediately unless the pipeline is lazy; a step that raises is not
+        registered, so a later `.pipe()` doesn't run it again.
+        """
+        if "copy" in inspect.signature(func).parameters:
+            kwargs = {**kwargs, "copy": False}
+        self.steps.append((func, args, kwargs))
+
+        if not self.lazy:
+            try:
+                self._run_pending()
+            except Exception:
+                self.steps.pop()
+                raise
+        return self
+
+    def collect(self) -> pd.DataFrame:
+        """
+        Run any planned steps and return the cleaned dataframe.
+        """
+        if self._frame is None:
+            self._frame = self._source.copy()
+        self._run_pending()
+        return self._frame
+
+    def _run_pending(self):
+        for func, args, kwargs in self.steps[self._n_run :]:
+            result = func(self._frame, *args, **kwargs)
+            if result is not None:
+                if not isinstance(result, pd.DataFrame):
+                    name = getattr(func, "__name__", repr(func))
+                    raise TypeError(
+                        f"Cleaning step {name} returned {type(result).__name__}, "
+                        "expected a DataFrame or None"
+                    )
+                self._frame = result
+            self._n_run += 1
+
+    def __repr__(self):
+        names = [getattr(func, "__name__", repr(func)) for func, _, _ in self.steps]
+        return f"CleaningPipeline(steps={names}, run={self._n_run}, lazy={self.lazy})"
+
+
 # %%
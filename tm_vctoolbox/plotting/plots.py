@@ -3,58 +3,93 @@ File containing general purpose plotting code
 """
 
 # %%
-import matplotlib.pyplot as plt
+from pathlib import Path
 
-# Sample data for the table
-data = [["A", 1, 10], ["B", 2, 20], ["C", 3, 30]]
-columns = ["Column 1", "Column 2", "Column 3"]
+from tm_vctoolbox.utils import lazy_import
 
-fig, ax = plt.subplots(figsize=(8, 2))  # Adjust figsize as needed
-ax.axis("off")  # Hide axes for a cleaner table appearance
-table = ax.table(cellText=data, colLabels=columns, loc="center")
-table.auto_set_font_size(False)
-table.set_fontsize(10)
-table.scale(1.2, 1.2)  # Adjust scaling if necessary
+# Only import matplotlib and python-pptx once a figure or slide is actually made
+plt = lazy_import("matplotlib.pyplot")
+pptx = lazy_import("pptx")
+pptx_util = lazy_import("pptx.util")
 
-plt.savefig(
-    "my_table.png", bbox_inches="tight", dpi=300
-)  # Save with high DPI for better quality
 
 # %%
-from pptx import Presentation
-from pptx.util import Inches
+def save_table_png(
+    data: list[list],
+    columns: list[str],
+    path: Path | str = "my_table.png",
+    figsize: tuple[float, float] = (8, 2),
+    fontsize: int = 10,
+    scale: float = 1.2,
+    dpi: int = 300,
+) -> Path:
+    """
+    Render rows of data as a table image and save it, e.g. to add to slides.
+    Returns the path of the saved image.
+    """
+    fig, ax = plt.subplots(figsize=figsize)  # Adjust figsize as needed
+    ax.axis("off")  # Hide axes for a cleaner table appearance
+    table = ax.table(cellText=data, colLabels=columns, loc="center")
+    table.auto_set_font_size(False)
+    table.set_fontsize(fontsize)
+    table.scale(scale, scale)  # Adjust scaling if necessary
 
-prs = Presentation()
-slide_layout = prs.slide_layouts[
-    5
-]  # Choose a suitable slide layout (e.g., Title and Content)
-slide = prs.slides.add_slide(slide_layout)
+    # Save with high DPI for better quality
+    fig.savefig(path, bbox_inches="tight", dpi=dpi)
+    plt.close(fig)
+    return Path(path)
 
-left = top = width = height = Inches(1)  # Adjust position and size as needed
-pic = slide.shapes.add_picture(
-    "my_table.png", left, top, width=Inches(6)
-)  # Adjust width/height
-
-prs.save("presentation_with_table.pptx")
 
 # %%
-import matplotlib.pyplot as plt
+def save_image_slide(
+    image_path: Path | str,
+    path: Path | str = "presentation_with_table.pptx",
+    slide_layout: int = 5,
+    left: float = 1,
+    top: float = 1,
+    width: float = 6,
+) -> Path:
+    """
+    Save a presentation with one slide holding an image. Positions and width are in
+    inches, and `slide_layout` indexes the default template's layouts (5: title only).
+    Returns the path of the saved presentation.
+    """
+    Inches = pptx_util.Inches
 
-# Set the fonttype parameter for searchable text in PDF
-plt.rcParams["pdf.fonttype"] = 42
-plt.rcParams["ps.fonttype"] = 42  # Also set for PostScript if needed
+    prs = pptx.Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[slide_layout])
+    slide.shapes.add_picture(
+        str(image_path), Inches(left), Inches(top), width=Inches(width)
+    )
+    prs.save(path)
+    return Path(path)
 
-# Create your plot
-fig, ax = plt.subplots()
-ax.plot([0, 1, 2], [0, 1, 4])
-ax.set_title("Searchable Text Example")
-ax.set_xlabel("X-axis Label")
-ax.set_ylabel("Y-axis Label")
-ax.text(0.5, 2, "Some text on the plot", horizontalalignment="center")
 
-# Save the figure as a PDF
-plt.savefig("searchable_figure.pdf", bbox_inches="tight")
+# %%
+def use_searchable_pdf_text():
+    """
+    Embed fonts as TrueType (Type 42) in PDF and PostScript output, so text in saved
+    figures stays searchable and editable.
+    """
+    plt.rcParams["pdf.fonttype"] = 42
+    plt.rcParams["ps.fonttype"] = 42  # Also set for PostScript if needed
 
-plt.show()
 
 # %%
+if __name__ == "__main__":
+    # Sample data for the table
+    data = [["A", 1, 10], ["B", 2, 20], ["C", 3, 30]]
+    columns = ["Column 1", "Column 2", "Column 3"]
+    table_png = save_table_png(data, columns, "my_table.png")
+    save_image_slide(table_png, "presentation_with_table.pptx")
+
+    # Create a plot with searchable text and save it as a PDF
+    use_searchable_pdf_text()
+    fig, ax = plt.subplots()
+    ax.plot([0, 1, 2], [0, 1, 4])
+    ax.set_title("Searchable Text Example")
+    ax.set_xlabel("X-axis Label")
+    ax.set_ylabel("Y-axis Label")
+    ax.text(0.5, 2, "Some text on the plot", horizontalalignment="center")
+    fig.savefig("searchable_figure.pdf", bbox_inches="tight")
+    plt.show()
@@ -20,10 +20,11 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List
 
-import matplotlib.font_manager as fm
-import matplotlib.pyplot as plt
+from tm_vctoolbox.utils import get_current_dir, lazy_import
 
-from tm_vctoolbox.utils import get_current_dir
+# matplotlib is slow to import, so only import it once a style is created
+fm = lazy_import("matplotlib.font_manager")
+plt = lazy_import("matplotlib.pyplot")
 
 
 # %%
@@ -0,0 +1,90 @@
+"""
+Benchmark and guard the import time of `tm_vctoolbox` modules with `python -X importtime`.
+
+CLI jobs that only need `data_cleaning` shouldn't pay for starting R (rpy2) or loading
+matplotlib / python-pptx. Each module is imported in a fresh interpreter, and the script
+exits with an error if a heavy dependency was imported or the import took longer than
+its budget.
+
+Run with `make importtime`, or `python benchmark_import_time.py --max-ms 800`.
+"""
+
+# %%
+import argparse
+import subprocess
+import sys
+
+# Module -> heavy dependencies it must not import at import time. pyarrow isn't listed:
+# pandas >= 2.2 imports it itself when it is installed
+GUARDED_IMPORTS = {
+    "tm_vctoolbox.data_cleaning": ["rpy2", "matplotlib", "pptx"],
+    "tm_vctoolbox.utils_rpy2": ["rpy2", "matplotlib", "pptx"],
+    "tm_vctoolbox.plotting.rvmd_style": ["rpy2", "matplotlib", "pptx"],
+    "tm_vctoolbox.plotting.plots": ["rpy2", "matplotlib", "pptx"],
+}
+
+
+# %%
+def measure_import(module: str) -> dict[str, int]:
+    """
+    Import `module` in a fresh interpreter and return the cumulative import time in
+    microseconds of every module it imported, as reported by `-X importtime`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def check_imports(max_ms: float, top: int = 5) -> list[str]:
+    """
+    Measure every guarded module and return the list of failures.
+    """
+    failures = []
+    for module, forbidden in GUARDED_IMPORTS.items():
+        times = measure_import(module)
+        total_ms = times.get(module, 0) / 1000
+        print(f"{module}: {total_ms:.0f} ms")
+        slowest = sorted(
+            ((t, name) for name, t in times.items() if "." not in name),
+            reverse=True,
+        )
+        for t, name in slowest[:top]:
+            print(f"    {name}: {t / 1000:.0f} ms")
+
+        imported = [dep for dep in forbidden if dep in times]
+        if imported:
+            failures.append(f"{module} imports {', '.join(imported)}")
+        if total_ms > max_ms:
+            failures.append(f"{module} took {total_ms:.0f} ms (budget {max_ms:.0f} ms)")
+    return failures
+
+
+# %%
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=1500,
+        help="import time budget per module, in milliseconds",
+    )
+    args = parser.parse_args()
+
+    failures = check_imports(args.max_ms)
+    for failure in failures:
+        print(f"[Error] {failure}")
+    sys.exit(1 if failures else 0)
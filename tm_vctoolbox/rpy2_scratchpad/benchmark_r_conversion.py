@@ -0,0 +1,72 @@
+"""
+Benchmark converting R data.frames to pandas with the pandas2ri and Arrow backends
+of `RScriptRunner`.
+
+Requires the `arrow` R package and `pyarrow`.
+"""
+
+# %%
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tm_vctoolbox.utils import get_current_dir
+from tm_vctoolbox.utils_rpy2 import RScriptRunner
+
+# %%
+# `my_df_func` / `my_wide_df_func` generate synthetic data.frames on the R side
+path_to_script = Path(get_current_dir()) / "test_r_functions.R"
+runner = RScriptRunner(None, path_to_script)
+
+# %%
+timings = []
+for function_name, n_rows, n_cols in [
+    ("my_df_func", 1_000_000, 2),
+    ("my_wide_df_func", 100_000, 50),
+    ("my_wide_df_func", 100_000, 200),
+    ("my_wide_df_func", 1_000_000, 50),
+]:
+    args = (n_rows,) if function_name == "my_df_func" else (n_rows, n_cols)
+    for backend in ["pandas2ri", "arrow"]:
+        start = time.perf_counter()
+        df = runner.call(function_name, *args, backend=backend)
+        timings.append(
+            {
+                "function": function_name,
+                "rows": n_rows,
+                "cols": n_cols,
+                "backend": backend,
+                "seconds": time.perf_counter() - start,
+            }
+        )
+
+print(
+    pd.DataFrame(timings)
+    .pivot_table(
+        index=["function", "rows", "cols"], columns="backend", values="seconds"
+    )
+    .assign(speedup=lambda t: t["pandas2ri"] / t["arrow"])
+)
+
+# %%
+# Benchmark passing the same large DataFrame argument to R repeatedly, with and without
+# a ConversionCache
+rng = np.random.default_rng(0)
+arg_df = pd.DataFrame(
+    {
+        **{f"num_{i}": rng.normal(size=1_000_000) for i in range(10)},
+        **{f"int_{i}": rng.integers(0, 100, size=1_000_000) for i in range(10)},
+        "arm": rng.choice(["A", "B", "C"], size=1_000_000),
+    }
+)
+cached_runner = RScriptRunner(None, path_to_script, arg_cache=True)
+
+for name, r in [("py2rpy", runner), ("ConversionCache", cached_runner)]:
+    start = time.perf_counter()
+    for _ in range(5):
+        r.call("my_nrow_func", arg_df)
+    print(f"{name}: {(time.perf_counter() - start) / 5:.3f}s per call")
+
+# %%
@@ -10,8 +10,10 @@ You should have the repo cloned somewhere and use those filepaths.
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-from tm_vctoolbox.utils_rpy2 import RScriptRunner
+from tm_vctoolbox.utils_rpy2 import RScriptRunner, RWorkerPool
 
 # %%
 # Activate renv where the `renv` is located
@@ -145,3 +147,91 @@ df = runner.call("pull_biodesix_data", "6236-001")
 print(df.head())
 
 # %%
+# Below is an example of running independent pulls in parallel with an RWorkerPool.
+# Each worker process starts its own R, activates renv and sources the scripts once.
+# Run this from a script guarded by `if __name__ == "__main__":` or from a notebook.
+edc_script = path_to_repo / "tm-graph2/lib/master/query_edc_master.R"
+scan_script = path_to_repo / "tm-graph2/lib/master/query_scan_master.R"
+
+with RWorkerPool(path_to_renv, [edc_script, scan_script], n_workers=2) as pool:
+    edc_future = pool.submit(
+        "pull_edc_master",
+        compound_study="6236-001",
+        edc_table="edc_overview",
+        script_path=edc_script,
+    )
+    scan_future = pool.submit("pull_scan", "6236-001", script_path=scan_script)
+    edc_df, scan_df = edc_future.result(), scan_future.result()
+
+print(edc_df.head())
+print(scan_df.head())
+
+# %%
+# Below is an example of streaming a large table into Parquet in chunks with call_iter.
+# The data.frame stays in R and only one chunk of rows is converted to pandas at a time.
+runner = RScriptRunner(path_to_renv, edc_script)
+writer = None
+for chunk in runner.call_iter(
+    "pull_edc_master", "6236-001", edc_table="edc_overview", chunksize=200_000
+):
+    # Chunks share their pandas dtypes, but an object column that is all NaN in a chunk
+    # would be inferred as Arrow's null type, so convert later chunks to the file schema
+    schema = writer.schema if writer is not None else None
+    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter("edc_overview.parquet", table.schema)
+    writer.write_table(table)
+if writer is not None:
+    writer.close()
+
+# %%
+# Below is an example of running several independent pulls from one script in a single
+# R evaluation with call_many. A call that fails returns its exception in place of a result.
+runner = RScriptRunner(path_to_renv, edc_script)
+results = runner.call_many(
+    [
+        ("pull_edc_master", ("6236-001",), {"edc_table": "edc_overview"}),
+        ("pull_edc_master", ("6236-002",), {"edc_table": "edc_overview"}),
+        ("pull_edc_master", ("6236-003",), {"edc_table": "edc_overview"}),
+    ]
+)
+for result in results:
+    if isinstance(result, Exception):
+        print(f"[Warning] {result}")
+    else:
+        print(result.head())
+
+# %%
+# Below is an example of running the same pull for several studies in parallel with
+# fan_out. Each result is tagged with its compound_study and the results come back as
+# one DataFrame, along with the time each study took.
+studies = ["6236-001", "6236-002", "6236-003"]
+
+with RWorkerPool(path_to_renv, [edc_script, scan_script], n_workers=3) as pool:
+    edc_df, edc_timings = pool.fan_out(
+        "pull_edc_master",
+        [{"compound_study": study} for study in studies],
+        edc_table="edc_overview",
+        script_path=edc_script,
+    )
+    scan_df, scan_timings = pool.fan_out(
+        "pull_scan",
+        [{"compound_study": study} for study in studies],
+        script_path=scan_script,
+    )
+
+print(edc_df.groupby("compound_study").size())
+print(edc_timings)
+
+# %%
+# Below is an example of iterating on R code with hot_reload. Before each call the runner
+# re-sources only the files that changed, e.g. an edited `utility_libs.R` sourced by the
+# script, instead of re-activating renv and sourcing everything again.
+runner = RScriptRunner(path_to_renv, edc_script, hot_reload=True)
+df = runner.call("pull_edc_master", "6236-001", edc_table="edc_overview")
+
+# ... edit query_edc_master.R or a file it sources, then call again
+df = runner.call("pull_edc_master", "6236-001", edc_table="edc_overview")
+print(df.head())
+
+# %%
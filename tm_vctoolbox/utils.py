@@ -3,6 +3,7 @@ File containing some general purpose code for manipulating data
 """
 
 # %%
+import importlib
 import inspect
 import os
 
@@ -44,3 +45,47 @@ def get_current_dir():
 
     # Get the directory of that filename
     return os.path.dirname(os.path.abspath(filename))
+
+
+# %%
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when one of its attributes is first
+    accessed. Create with `lazy_import`.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Return a module that is imported on first attribute access, for heavy dependencies
+    (rpy2, matplotlib, pptx) that would otherwise slow down importing this package.
+
+    Parameters:
+        name (str): Full module name, e.g. "rpy2.robjects".
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the imported module.
+    """
+    return LazyModule(name)
@@ -9,208 +9,2652 @@ Ensure compatibility with your R project's renv setup.
 
 # %%
 # Import libraries
+import asyncio
+import functools
+import hashlib
+import json
+import multiprocessing
 import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import contextmanager, suppress
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
-import rpy2.robjects as ro
-from rpy2 import robjects
-from rpy2.rinterface_lib.sexp import NULLType
-from rpy2.rlike.container import NamedList
-from rpy2.robjects import pandas2ri
-from rpy2.robjects.conversion import localconverter
-from rpy2.robjects.vectors import (
-    BoolVector,
-    FloatVector,
-    IntVector,
-    ListVector,
-    StrVector,
-)
+import numpy as np
+import pandas as pd
+
+from tm_vctoolbox.utils import lazy_import
+
+# rpy2 starts the embedded R interpreter when it is imported, so only import it once R
+# is actually used
+ro = robjects = lazy_import("rpy2.robjects")
+rinterface = lazy_import("rpy2.rinterface")
+rsexp = lazy_import("rpy2.rinterface_lib.sexp")
+rlc = lazy_import("rpy2.rlike.container")
+pandas2ri = lazy_import("rpy2.robjects.pandas2ri")
+rconversion = lazy_import("rpy2.robjects.conversion")
+rvectors = lazy_import("rpy2.robjects.vectors")
+
+# %%
+# The embedded R interpreter is not thread-safe, so every entry into R holds this lock
+_R_LOCK = threading.RLock()
+
+_r_executor = None
+_r_executor_lock = threading.Lock()
+
+
+def _get_r_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide thread that runs R calls queued by `RScriptRunner.acall`.
+    """
+    global _r_executor
+    with _r_executor_lock:
+        if _r_executor is None:
+            _r_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rpy2")
+        return _r_executor
+
+
+# %%
+# The renv project activated in this process, see `activate_renv`
+_renv_state = {"project": None, "lock_hash": None, "timings": {}}
+
+
+def activate_renv(path_to_renv: Path, switch: bool = False) -> dict:
+    """
+    Activates the renv environment using renv::load() to ensure the correct project is loaded.
+    This avoids sourcing activate.R directly and avoids accidentally initializing a new environment.
+
+    Activation is recorded per process, keyed on the project dir and the hash of its
+    renv.lock, so activating the same project again (e.g. from every `RScriptRunner`) is
+    a no-op. If renv.lock changed, the project is loaded again. Activating a different
+    project than the one already loaded raises a RuntimeError unless `switch=True`, since
+    packages already attached from the old library stay loaded in the R session.
+
+    Returns the seconds spent in each phase of the last activation, see
+    `renv_activation_info`.
+    """
+
+    renv_project_dir = path_to_renv.resolve()
+    renv_activate = renv_project_dir / "renv" / "activate.R"
+    renv_lock = renv_project_dir / "renv.lock"
+
+    if not renv_activate.exists() or not renv_lock.exists():
+        raise FileNotFoundError(
+            f"[Error] renv environment not found or incomplete at: {renv_project_dir}"
+        )
+
+    lock_hash = _file_hash(renv_lock)
+    with _R_LOCK:
+        active_project = _renv_state["project"]
+        if active_project == renv_project_dir and _renv_state["lock_hash"] == lock_hash:
+            return dict(_renv_state["timings"])
+        if active_project is not None and active_project != renv_project_dir:
+            if not switch:
+                raise RuntimeError(
+                    f"[Error] renv project {active_project} is already active in this "
+                    f"process; pass switch=True to load {renv_project_dir} instead"
+                )
+            print(f"[Info] Switching renv project from {active_project}")
+
+        timings = {}
+        start = time.perf_counter()
+
+        # Optional: set R_ENVIRON_USER if .Renviron exists
+        renviron_file = renv_project_dir / ".Renviron"
+        if renviron_file.is_file():
+            os.environ["R_ENVIRON_USER"] = str(renviron_file)
+            print("[Info] R_ENVIRON_USER set to:", renviron_file)
+
+        # Load the renv package
+        try:
+            robjects.r("library(renv)")
+        except Exception:
+            print("[Info] renv package not found in R. Attempting to install...")
+            robjects.r('install.packages("renv", repos="https://cloud.r-project.org")')
+            # Try loading again after installation
+            robjects.r("library(renv)")
+        timings["library"] = time.perf_counter() - start
+
+        # Load the renv environment using renv::load(path)
+        start = time.perf_counter()
+        try:
+            print("Using R at:", robjects.r("R.home()")[0])
+            robjects.r(f'renv::load("{renv_project_dir.as_posix()}")')
+            print(f"[Info] renv environment loaded for project: {renv_project_dir}")
+        except Exception as e:
+            raise RuntimeError(f"[Error] Failed to load renv environment: {e}")
+        timings["load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        print(".libPaths()")
+        print(robjects.r(".libPaths()"))
+        timings["lib_paths"] = time.perf_counter() - start
+
+        _renv_state.update(
+            project=renv_project_dir, lock_hash=lock_hash, timings=timings
+        )
+    return dict(timings)
+
+
+def renv_activation_info() -> dict:
+    """
+    Return the renv project activated in this process (None if none), the hash of its
+    renv.lock, and the seconds spent in each phase of its activation: "library"
+    (loading the renv package), "load" (`renv::load`) and "lib_paths".
+    """
+    with _R_LOCK:
+        return {
+            "project": _renv_state["project"],
+            "lock_hash": _renv_state["lock_hash"],
+            "timings": dict(_renv_state["timings"]),
+        }
+
+
+# %%
+# Returned by ResultCache.get() for missing or expired keys
+_CACHE_MISS = object()
+
+
+class ResultCache:
+    """
+    In-memory LRU cache of post-processed `RScriptRunner.call` results.
+
+    Entries are evicted least-recently-used first once `maxsize` is reached, and expire
+    `ttl` seconds after they were stored (never, if ttl is None). A cache can be shared
+    between runners since keys include the script path and a hash of its contents.
+    """
+
+    def __init__(self, maxsize: int = 32, ttl: float | None = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or `_CACHE_MISS` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _CACHE_MISS
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return _CACHE_MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entries if full.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self, function_name: str | None = None, script_path: Path | None = None
+    ):
+        """
+        Drop cached entries, optionally only those for a given R function and/or script.
+        With no arguments the whole cache is cleared.
+        """
+        with self._lock:
+            if function_name is None and script_path is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                key_script, key_function = key[0], key[1]
+                if function_name is not None and key_function != function_name:
+                    continue
+                if script_path is not None and key_script != str(script_path):
+                    continue
+                del self._entries[key]
+
+    def clear(self):
+        """
+        Drop all cached entries.
+        """
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _stable_hash(obj, hasher=None) -> str:
+    """
+    Return a hash of `obj` that is stable across processes (unlike hash()).
+    Supports primitives, Paths, NumPy arrays, pandas objects and nested lists/tuples/dicts.
+    Raises TypeError for anything else.
+    """
+    top_level = hasher is None
+    if top_level:
+        hasher = hashlib.sha256()
+
+    hasher.update(type(obj).__name__.encode())
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        hasher.update(repr(obj).encode())
+    elif isinstance(obj, Path):
+        hasher.update(obj.as_posix().encode())
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        hasher.update(repr(obj.shape).encode())
+        if isinstance(obj, pd.DataFrame):
+            hasher.update(repr(list(obj.columns)).encode())
+            hasher.update(repr(obj.dtypes.astype(str).tolist()).encode())
+        else:
+            hasher.update(repr((obj.name, str(obj.dtype))).encode())
+        hasher.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        hasher.update(repr((obj.dtype.str, obj.shape)).encode())
+        if obj.dtype == object:
+            _stable_hash(obj.ravel().tolist(), hasher)
+        else:
+            hasher.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(str(len(obj)).encode())
+        for item in obj:
+            _stable_hash(item, hasher)
+    elif isinstance(obj, dict):
+        hasher.update(str(len(obj)).encode())
+        for key in sorted(obj, key=repr):
+            _stable_hash(key, hasher)
+            _stable_hash(obj[key], hasher)
+    else:
+        raise TypeError(f"Cannot hash argument of type {type(obj).__name__}")
+
+    return hasher.hexdigest() if top_level else None
+
+
+def _file_hash(path: Path) -> str:
+    """
+    Return the SHA-256 hash of a file's contents.
+    """
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _copy_result(obj):
+    """
+    Copy the DataFrames in a (possibly nested) call result so cached values can't be
+    modified by the caller.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return obj.copy()
+    elif isinstance(obj, dict):
+        return {k: _copy_result(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_copy_result(item) for item in obj]
+    return obj
+
+
+# %%
+class ConversionCache:
+    """
+    In-memory LRU cache of DataFrame and NumPy array arguments converted to R.
+
+    `RScriptRunner.call` converts every argument with py2rpy on every call, so passing the
+    same large DataFrame to several R functions converts it again each time. With a
+    ConversionCache the R object is kept under a hash of the argument's contents and
+    reused. Keys are content hashes rather than object identity because DataFrames can be
+    modified in place, and a modified frame must be converted again. A cache can be
+    shared between runners. The least recently used objects are dropped once `maxsize`
+    is reached, which lets R free them.
+
+    Misses are converted with `pandas_to_r_dataframe` / `numpy_to_r_vector`, which copy
+    numeric columns straight into R vectors. With `factor_strings=True` string columns
+    with few distinct values are passed as R factors, which is faster to build, but
+    only suits R functions that treat them like character vectors.
+    """
+
+    def __init__(self, maxsize: int = 8, factor_strings: bool = False):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.factor_strings = factor_strings
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def convert(self, obj):
+        """
+        Return `obj` converted to R, from the cache if an equal object was converted
+        before. The caller must hold `_R_LOCK`.
+        """
+        try:
+            key = _stable_hash(obj)
+        except TypeError:
+            return self._convert(obj)
+
+        with self._lock:
+            r_obj = self._entries.get(key)
+            if r_obj is not None:
+                self._entries.move_to_end(key)
+                return r_obj
+
+        r_obj = self._convert(obj)
+        with self._lock:
+            self._entries[key] = r_obj
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return r_obj
+
+    def _convert(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            return pandas_to_r_dataframe(obj, factor_strings=self.factor_strings)
+        if isinstance(obj, np.ndarray) and obj.ndim == 1:
+            return numpy_to_r_vector(obj)
+        with rconversion.localconverter(
+            robjects.default_converter + pandas2ri.converter
+        ):
+            return robjects.conversion.py2rpy(obj)
+
+    def clear(self):
+        """
+        Drop all cached R objects.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# %%
+class DiskResultStore:
+    """
+    On-disk, content-addressed store of post-processed `RScriptRunner.call` results that can
+    be shared by every process on a host.
+
+    Each result is stored in its own directory under `root`, named after a hash of the call
+    key, as a small JSON manifest describing the (possibly nested) result plus one Arrow IPC
+    file per DataFrame. Reads memory-map the Arrow files so the data isn't read into an
+    intermediate buffer first; with `zero_copy=True` numeric columns without nulls are backed
+    directly by the mapped file (and are read-only).
+
+    Writers hold an exclusive `flock` on a per-key lock file while they compute and write an
+    entry, so concurrent processes asking for the same result run the R call only once.
+    Once the store grows past `max_bytes`, the least recently used entries are deleted.
+
+    Requires `pyarrow`.
+    """
+
+    _MANIFEST = "manifest.json"
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = 10 * 1024**3,
+        zero_copy: bool = False,
+    ):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "DiskResultStore requires pyarrow. Install it with `pip install pyarrow`."
+            ) from e
+
+        self.root = Path(root).expanduser().resolve()
+        self.max_bytes = max_bytes
+        self.zero_copy = zero_copy
+        (self.root / "locks").mkdir(parents=True, exist_ok=True)
+        (self.root / "tmp").mkdir(exist_ok=True)
+
+    @contextmanager
+    def lock(self, name: str):
+        """
+        Hold an exclusive, cross-process lock named `name` for the duration of the block.
+        """
+        import fcntl
+
+        with open(self.root / "locks" / f"{name}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_or_call(self, key: tuple, func):
+        """
+        Return the stored result for `key`, or call `func()`, store its result and return it.
+        Results that can't be stored (e.g. unconverted R objects) are returned but not stored.
+        """
+        digest = _stable_hash(key)
+        with self.lock(digest):
+            result = self.get(digest)
+            if result is not _CACHE_MISS:
+                return result
+
+            result = func()
+            try:
+                self.put(digest, result, key=key)
+            except (TypeError, ValueError) as e:
+                print(f"[Info] Result not written to disk store: {e}")
+                return result
+
+        self._evict()
+        return result
+
+    def get(self, digest: str):
+        """
+        Read the result stored under `digest`, or return `_CACHE_MISS` if there is none.
+        """
+        entry_dir = self.root / digest[:2] / digest
+        manifest_file = entry_dir / self._MANIFEST
+        try:
+            manifest = json.loads(manifest_file.read_text())
+            result = self._decode(manifest["result"], entry_dir)
+        except FileNotFoundError:
+            # Missing, or evicted by another process while reading
+            return _CACHE_MISS
+
+        # Mark the entry as recently used for eviction
+        os.utime(manifest_file)
+        return result
+
+    def put(self, digest: str, result, key: tuple | None = None):
+        """
+        Write `result` under `digest`. The entry is written to a temporary directory and then
+        renamed into place, so readers never see a partially written entry.
+        """
+        entry_dir = self.root / digest[:2] / digest
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.root / "tmp"))
+        try:
+            manifest = {
+                "script_path": key[0] if key else None,
+                "function_name": key[1] if key else None,
+                "result": self._encode(result, tmp_dir, counter=[0]),
+            }
+            (tmp_dir / self._MANIFEST).write_text(json.dumps(manifest))
+
+            entry_dir.parent.mkdir(exist_ok=True)
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def invalidate(
+        self, function_name: str | None = None, script_path: Path | None = None
+    ):
+        """
+        Delete stored entries, optionally only those for a given R function and/or script.
+        With no arguments the whole store is cleared.
+        """
+        with self.lock("store"):
+            for entry_dir, manifest in self._entries():
+                if (
+                    function_name is not None
+                    and manifest.get("function_name") != function_name
+                ):
+                    continue
+                if script_path is not None and manifest.get("script_path") != str(
+                    script_path
+                ):
+                    continue
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def clear(self):
+        """
+        Delete all stored entries.
+        """
+        self.invalidate()
+
+    def size(self) -> int:
+        """
+        Return the total size in bytes of the stored entries.
+        """
+        return sum(_dir_size(entry_dir) for entry_dir, _ in self._entries())
+
+    def _entries(self):
+        for manifest_file in self.root.glob(f"??/*/{self._MANIFEST}"):
+            try:
+                yield manifest_file.parent, json.loads(manifest_file.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+    def _evict(self):
+        """
+        Delete least recently used entries until the store is below `max_bytes`.
+        """
+        with self.lock("store"):
+            entries = []
+            for entry_dir, _ in self._entries():
+                try:
+                    last_used = (entry_dir / self._MANIFEST).stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                entries.append((last_used, _dir_size(entry_dir), entry_dir))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+
+    def _encode(self, obj, entry_dir: Path, counter: list):
+        """
+        Write the DataFrames in `obj` to Arrow files and return a JSON-able description.
+        """
+        import pyarrow as pa
+
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            is_series = isinstance(obj, pd.Series)
+            if is_series:
+                # Arrow turns column names into strings (an unnamed Series' column is
+                # 0), so the Series name is kept in the manifest
+                name = obj.name.item() if isinstance(obj.name, np.generic) else obj.name
+                if name is not None and not isinstance(name, (bool, int, float, str)):
+                    raise TypeError(
+                        f"Series names of type {type(name).__name__} can't be stored"
+                    )
+            frame = obj.to_frame() if is_series else obj
+            file_name = f"{counter[0]}.arrow"
+            counter[0] += 1
+            try:
+                table = pa.Table.from_pandas(frame, preserve_index=None)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise TypeError(f"DataFrame can't be converted to Arrow: {e}") from e
+            with (
+                pa.OSFile(str(entry_dir / file_name), "wb") as sink,
+                pa.ipc.new_file(sink, table.schema) as writer,
+            ):
+                writer.write_table(table)
+            if not is_series:
+                return {"type": "frame", "file": file_name}
+            return {"type": "series", "file": file_name, "name": name}
+
+        elif isinstance(obj, np.ndarray) and obj.ndim == 1:
+            node = self._encode(pd.Series(obj, name="values"), entry_dir, counter)
+            return {"type": "array", "file": node["file"]}
+
+        elif isinstance(obj, dict):
+            return {
+                "type": "dict",
+                "items": [
+                    [k, self._encode(v, entry_dir, counter)] for k, v in obj.items()
+                ],
+            }
+        elif isinstance(obj, list):
+            return {
+                "type": "list",
+                "items": [self._encode(v, entry_dir, counter) for v in obj],
+            }
+        elif isinstance(obj, np.generic):
+            obj = obj.item()
+
+        if obj is not None and not isinstance(obj, (bool, int, float, str)):
+            raise TypeError(f"Values of type {type(obj).__name__} can't be stored")
+        return {"type": "value", "value": obj}
+
+    def _decode(self, node: dict, entry_dir: Path):
+        """
+        Rebuild a result from its manifest description, reading DataFrames memory-mapped.
+        """
+        import pyarrow as pa
+
+        if node["type"] in ("frame", "series"):
+            source = pa.memory_map(str(entry_dir / node["file"]), "r")
+            table = pa.ipc.open_file(source).read_all()
+            frame = table.to_pandas(split_blocks=self.zero_copy)
+
+            # Arrow hands back nulls in object columns as None; use np.nan like the
+            # post-processed result of a cache miss
+            for i in range(frame.shape[1]):
+                column = frame.iloc[:, i]
+                if pd.api.types.is_object_dtype(column):
+                    missing = column.isna().to_numpy()
+                    if missing.any():
+                        frame.isetitem(i, column.mask(missing, np.nan))
+            if node["type"] == "frame":
+                return frame
+            series = frame.iloc[:, 0]
+            if "name" in node:
+                series.name = node["name"]
+            return series
+
+        elif node["type"] == "array":
+            source = pa.memory_map(str(entry_dir / node["file"]), "r")
+            values = pa.ipc.open_file(source).read_all().column(0).to_numpy()
+            if values.dtype == object:
+                values[pd.isna(values)] = np.nan
+            return values
+
+        elif node["type"] == "dict":
+            return {k: self._decode(v, entry_dir) for k, v in node["items"]}
+        elif node["type"] == "list":
+            return [self._decode(v, entry_dir) for v in node["items"]]
+        return node["value"]
+
+
+def _dir_size(path: Path) -> int:
+    """
+    Return the total size in bytes of the files in a directory.
+    """
+    total = 0
+    for file in path.iterdir():
+        try:
+            total += file.stat().st_size
+        except FileNotFoundError:
+            continue
+    return total
+
+
+# %%
+_DRIFT_ACTIONS = ("warn", "raise", "update")
+
+
+def _format_drift(function_name: str, drift: dict) -> str:
+    changes = "\n".join(
+        f"  {frame or '<result>'}: {change}"
+        for frame, frame_changes in drift.items()
+        for change in frame_changes
+    )
+    return f"Schema drift in R function '{function_name}':\n{changes}"
+
+
+def _normalize_schema(schema: dict | None) -> dict | None:
+    """
+    Turn a `schema=` argument of `RScriptRunner.call` into {frame: {column: dtype name}}.
+    """
+    if schema is None:
+        return None
+    if not all(isinstance(v, dict) for v in schema.values()):
+        schema = {"": schema}
+    return {
+        str(frame): {
+            str(column): str(pd.api.types.pandas_dtype(dtype))
+            for column, dtype in columns.items()
+        }
+        for frame, columns in schema.items()
+    }
+
+
+class SchemaRegistry:
+    """
+    Persisted dtypes of the data.frames returned by R functions, so repeat calls can cast
+    straight to them instead of inferring dtypes from the values.
+
+    The schema of a function is stored the first time it runs, as
+    `<script name>.<path hash>.<function name>.json` under `root` (e.g. a `.schemas` folder
+    next to the R script). It records, per column, the R class and dtype as converted from R and the
+    final dtype after post-processing. A later call whose columns no longer match (added,
+    missing or retyped columns, or values that don't fit the stored dtype) is reported as
+    schema drift, handled according to `on_drift`:
+    - "warn": print a warning, infer the drifted columns from their values and keep the
+      stored schema
+    - "raise": raise a ValueError
+    - "update": print a note and store the newly inferred schema
+    """
+
+    def __init__(self, root: Path, on_drift: str = "warn"):
+        if on_drift not in _DRIFT_ACTIONS:
+            raise ValueError(
+                f"Unknown on_drift '{on_drift}', expected one of {_DRIFT_ACTIONS}"
+            )
+        self.root = Path(root).expanduser().resolve()
+        self.on_drift = on_drift
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def _path(self, script_path: Path, function_name: str) -> Path:
+        # Hash the full path so same-named scripts in different folders don't collide
+        script_path = Path(script_path).expanduser().resolve()
+        path_hash = hashlib.sha256(str(script_path).encode()).hexdigest()[:12]
+        return self.root / f"{script_path.name}.{path_hash}.{function_name}.json"
+
+    def get(self, script_path: Path, function_name: str) -> dict | None:
+        """
+        Return the stored schema of an R function as {frame: {column: entry}}, where frame
+        is "" for a data.frame result and e.g. "df" or "tables/0" for nested ones. Returns
+        None if no schema is stored yet.
+        """
+        path = self._path(script_path, function_name)
+        with self._lock:
+            if path not in self._schemas:
+                if not path.exists():
+                    return None
+                self._schemas[path] = json.loads(path.read_text())["frames"]
+            return self._schemas[path]
+
+    def set(self, script_path: Path, function_name: str, frames: dict):
+        """
+        Store the schema of an R function, replacing any previous one.
+        """
+        path = self._path(script_path, function_name)
+        self.root.mkdir(parents=True, exist_ok=True)
+        manifest = {"function": function_name, "frames": frames}
+        with self._lock:
+            # Write to a temporary file first so other processes never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, path)
+            self._schemas[path] = frames
+
+    def invalidate(
+        self, function_name: str | None = None, script_path: Path | None = None
+    ):
+        """
+        Delete stored schemas, optionally only those of a given R function and/or script.
+        """
+        if script_path is not None:
+            pattern = self._path(script_path, function_name or "*").name
+        else:
+            pattern = f"*.*.{function_name or '*'}.json"
+        with self._lock:
+            for path in self.root.glob(pattern):
+                path.unlink(missing_ok=True)
+                self._schemas.pop(path, None)
+
+    def report_drift(
+        self, script_path: Path, function_name: str, drift: dict, frames: dict
+    ):
+        """
+        Handle schema drift found in a call of `function_name`, according to `on_drift`.
+        `drift` maps frame names to lists of changes, `frames` is the newly inferred schema.
+        """
+        message = _format_drift(function_name, drift)
+        if self.on_drift == "raise":
+            raise ValueError(message)
+        if self.on_drift == "update":
+            self.set(script_path, function_name, frames)
+            print(f"[Info] {message}\n  Stored the new schema.")
+        else:
+            print(f"[Warning] {message}")
+
+
+# %%
+# Process-wide registry of sourced R scripts: resolved path -> (environment, content hash)
+_script_envs = {}
+
+# Files each registered script sourced, itself included, in the order they were sourced:
+# resolved path -> {file: {"hash", "mtime", "target"}}. The target is where the file was
+# sourced into: "script" (the script's environment), "global" (globalenv) or "" (other)
+_script_sources = {}
+
+# Sources a file into `env` and returns every file `source()`d meanwhile, including files
+# sourced by the files it sources, with where each was sourced into relative to the
+# script environment `script_env`, and the names in globalenv it created or changed
+_R_SOURCE_TRACKED = """
+function(file, env, script_env) {
+    globals_before <- as.list(globalenv(), all.names = TRUE)
+    files <- character()
+    targets <- character()
+    record <- function(file, local, caller) {
+        if (!is.character(file)) return(invisible())
+        target <- if (isTRUE(local)) caller else if (is.environment(local)) local else globalenv()
+        files <<- c(files, normalizePath(file, mustWork = FALSE))
+        targets <<- c(targets, if (identical(target, script_env)) "script"
+                               else if (identical(target, globalenv())) "global" else "")
+    }
+    suppressMessages(trace(
+        "source", tracer = bquote(.(record)(file, local, parent.frame())),
+        where = baseenv(), print = FALSE
+    ))
+    on.exit(suppressMessages(untrace("source", where = baseenv())))
+    source(file, local = env)
+    keep <- !duplicated(files)
+
+    globals_after <- as.list(globalenv(), all.names = TRUE)
+    changed <- vapply(
+        names(globals_after),
+        function(name) !identical(globals_before[[name]], globals_after[[name]]),
+        logical(1)
+    )
+    globals <- setdiff(as.character(names(globals_after)[changed]), ".Random.seed")
+    list(files = files[keep], targets = targets[keep], globals = globals)
+}
+"""
+
+
+@functools.cache
+def _get_r_source_tracked():
+    return robjects.r(_R_SOURCE_TRACKED)
+
+
+def _source_tracked(file: Path, env, script_env) -> tuple[dict, list[str]]:
+    """
+    Source an R file into `env` and return the files sourced meanwhile, in the format of
+    `_script_sources`, and the names in globalenv that sourcing created or changed.
+    The caller must hold `_R_LOCK`.
+    """
+    result = _get_r_source_tracked()(file.as_posix(), env, script_env)
+    sources = {}
+    for f, target in zip(result.rx2("files"), result.rx2("targets")):
+        path = Path(f)
+        if path.is_file():
+            sources[path] = {
+                "hash": _file_hash(path),
+                "mtime": path.stat().st_mtime_ns,
+                "target": target,
+            }
+    return sources, [str(name) for name in result.rx2("globals")]
+
+
+# A new script environment, whose parent is globalenv. It binds a `source` that sources
+# into the script environment by default, so helper files a script (or a file it
+# sources) loads with a plain `source("utils.R")` stay in the script environment rather
+# than globalenv. An explicit `local` (FALSE, TRUE or an environment) is honoured
+_R_NEW_SCRIPT_ENV = """
+function() {
+    env <- new.env(parent = globalenv())
+    env$source <- function(file, local = env, ...) {
+        if (isTRUE(local)) local <- parent.frame()
+        get("source", envir = baseenv())(file, local = local, ...)
+    }
+    env
+}
+"""
+
+
+@functools.cache
+def _get_r_new_script_env():
+    return robjects.r(_R_NEW_SCRIPT_ENV)
+
+
+def _sources_hash(sources: dict) -> str:
+    """
+    Return a hash of the contents of all the files a script sourced.
+    """
+    return _stable_hash(sorted((str(f), info["hash"]) for f, info in sources.items()))
+
+
+def _changed_sources(sources: dict) -> list[Path]:
+    """
+    Return the files in `sources` (see `_script_sources`) whose contents changed since
+    they were sourced. Only files whose modification time moved are hashed again; their
+    new mtime is recorded. Deleted files are skipped.
+    """
+    changed = []
+    for path, info in sources.items():
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if mtime == info["mtime"]:
+            continue
+        info["mtime"] = mtime
+        if _file_hash(path) != info["hash"]:
+            changed.append(path)
+    return changed
+
+
+def _source_script(
+    script_path: Path,
+    snapshots: "RSessionSnapshots | None" = None,
+    lock_hash: str | None = None,
+) -> tuple:
+    """
+    Return the environment holding the definitions of an R script and the script's
+    hash, sourcing it first unless it was already sourced with the same contents, of the
+    script and of every file it sources.
+
+    Each script is sourced into its own environment (whose parent is globalenv), so
+    scripts that define the same helper names don't overwrite each other, and runners
+    for the same script share one environment instead of sourcing it again. Files the
+    script sources without an explicit `local` go into that environment too (see
+    `_R_NEW_SCRIPT_ENV`); only files sourced with `local = FALSE` or
+    `local = globalenv()` still define their objects in globalenv. The files the script
+    sources are recorded in `_script_sources`.
+
+    With `snapshots`, a snapshot that is still valid for the sourced files and the renv
+    lockfile hash `lock_hash` is restored instead of sourcing, and a fresh one is saved
+    after sourcing. The caller must hold `_R_LOCK`.
+    """
+    script_hash = _file_hash(script_path)
+    entry = _script_envs.get(script_path)
+    if (
+        entry is not None
+        and entry[1] == script_hash
+        and not _changed_sources(_script_sources[script_path])
+    ):
+        return entry
+
+    restored = snapshots.load(script_path, lock_hash) if snapshots else None
+    if restored is not None:
+        env, sources = restored
+        print(f"[Info] R script restored from snapshot: {script_path.name}")
+    else:
+        env = _get_r_new_script_env()()
+        sources, globals_ = _source_tracked(script_path, env, env)
+        print(f"[Info] R script sourced: {script_path.name}")
+        if snapshots is not None:
+            snapshots.save(script_path, env, sources, lock_hash, globals_)
+
+    _script_envs[script_path] = (env, script_hash)
+    _script_sources[script_path] = sources
+    return env, script_hash
+
+
+# Saves a script environment, the given objects in globalenv and the attached packages
+_R_SAVE_SNAPSHOT = """
+function(env, globals, file) {
+    saveRDS(
+        list(
+            env = env,
+            global = mget(globals, envir = globalenv()),
+            packages = rev(.packages())
+        ),
+        file
+    )
+}
+"""
+
+# Attaches the saved packages, restores the saved globalenv objects and returns the script
+# environment
+_R_LOAD_SNAPSHOT = """
+function(file) {
+    snapshot <- readRDS(file)
+    for (package in snapshot$packages) {
+        suppressPackageStartupMessages(library(package, character.only = TRUE))
+    }
+    list2env(snapshot$global, envir = globalenv())
+    snapshot$env
+}
+"""
+
+
+@functools.cache
+def _get_r_save_snapshot():
+    return robjects.r(_R_SAVE_SNAPSHOT)
+
+
+@functools.cache
+def _get_r_load_snapshot():
+    return robjects.r(_R_LOAD_SNAPSHOT)
+
+
+class RSessionSnapshots:
+    """
+    Serialized R sessions of sourced scripts, so new processes (kernels, `RWorkerPool`
+    workers) can restore a script instead of sourcing it again.
+
+    A snapshot of a script is saved with `saveRDS` under `root` after it is sourced. It
+    holds the script's environment, the objects in globalenv that sourcing the script
+    created or changed (e.g. helpers from files the script sources there) and the
+    attached packages. Other objects in globalenv are neither saved nor overwritten on
+    restore. A small JSON manifest records those names, and the hash of every file the
+    script sourced and of the renv.lock. A snapshot is only
+    restored while all of those hashes still match; otherwise it is deleted and the
+    script is sourced and snapshotted again.
+
+    Restoring still attaches the recorded packages (R can't serialize loaded namespaces),
+    but skips sourcing the scripts and whatever work they do at the top level.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser().resolve()
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, script_path: Path) -> Path:
+        path_hash = hashlib.sha256(str(script_path).encode()).hexdigest()[:12]
+        return self.root / f"{script_path.name}.{path_hash}.json"
+
+    def load(self, script_path: Path, lock_hash: str | None = None) -> tuple | None:
+        """
+        Restore the snapshot of a script if it is still valid, returning its environment
+        and the files it sourced (see `_script_sources`). Returns None otherwise.
+        The caller must hold `_R_LOCK`.
+        """
+        manifest_path = self._manifest_path(script_path)
+        with self._lock:
+            if not manifest_path.exists():
+                return None
+            manifest = json.loads(manifest_path.read_text())
+            image = self.root / manifest["image"]
+            sources = {Path(f): dict(info) for f, info in manifest["sources"].items()}
+            if (
+                manifest["lock_hash"] != lock_hash
+                or "globals" not in manifest
+                or not image.exists()
+                or any(
+                    not f.is_file() or _file_hash(f) != info["hash"]
+                    for f, info in sources.items()
+                )
+            ):
+                print(f"[Info] R snapshot out of date: {script_path.name}")
+                manifest_path.unlink(missing_ok=True)
+                image.unlink(missing_ok=True)
+                return None
+
+        try:
+            env = _get_r_load_snapshot()(image.as_posix())
+        except RuntimeError as e:
+            # rpy2's RRuntimeError, e.g. a corrupt image or a package that is gone
+            print(f"[Warning] Failed to restore R snapshot of {script_path.name}: {e}")
+            return None
+        for f, info in sources.items():
+            info["mtime"] = f.stat().st_mtime_ns
+        return env, sources
+
+    def save(
+        self,
+        script_path: Path,
+        env,
+        sources: dict,
+        lock_hash: str | None = None,
+        globals_: list[str] | None = None,
+    ):
+        """
+        Save the snapshot of a sourced script, replacing any previous one. `globals_` are
+        the names in globalenv that sourcing the script created or changed.
+        The caller must hold `_R_LOCK`.
+        """
+        globals_ = list(globals_ or [])
+        manifest_path = self._manifest_path(script_path)
+        state_hash = _stable_hash((lock_hash, _sources_hash(sources)))
+        image = manifest_path.with_name(f"{manifest_path.stem}.{state_hash[:12]}.rds")
+        manifest = {
+            "script": str(script_path),
+            "image": image.name,
+            "lock_hash": lock_hash,
+            "sources": {
+                str(f): {"hash": info["hash"], "target": info["target"]}
+                for f, info in sources.items()
+            },
+            "globals": globals_,
+        }
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # Write to temporary files first so other processes never read a partial file
+            fd, tmp_image = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            os.close(fd)
+            _get_r_save_snapshot()(
+                env, rvectors.StrVector(globals_), Path(tmp_image).as_posix()
+            )
+            os.replace(tmp_image, image)
+            fd, tmp_manifest = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_manifest, manifest_path)
+
+            # Drop images of older states of this script
+            for old in self.root.glob(f"{manifest_path.stem}.*.rds"):
+                if old != image:
+                    old.unlink(missing_ok=True)
+
+    def invalidate(self, script_path: Path | None = None):
+        """
+        Delete stored snapshots, optionally only the one of a given script.
+        """
+        pattern = (
+            f"{self._manifest_path(Path(script_path).resolve()).stem}.*"
+            if script_path is not None
+            else "*"
+        )
+        with self._lock:
+            for path in self.root.glob(pattern):
+                if path.suffix in (".json", ".rds"):
+                    path.unlink(missing_ok=True)
+
+
+# %%
+class RScriptRunner:
+    """
+    A utility class to load and execute R functions from a specified R script using rpy2.
+    """
+
+    def __init__(
+        self,
+        path_to_renv: Path | None,
+        script_path: Path,
+        cache: ResultCache | bool | None = None,
+        store: DiskResultStore | None = None,
+        backend: str = "pandas2ri",
+        schemas: SchemaRegistry | None = None,
+        vectors: str = "list",
+        arg_cache: ConversionCache | bool | None = None,
+        snapshots: RSessionSnapshots | None = None,
+        hot_reload: bool = False,
+    ):
+        """
+        Initialize the RScriptRunner with the path to the renv environment and the R script.
+        Set path_to_renv to None if no renv is used.
+
+        The script is sourced into its own R environment once per process; further runners
+        for the same (unchanged) script reuse that environment, and functions of different
+        scripts with the same name don't clash.
+
+        `backend` sets how R data.frames are converted to pandas by default, and `vectors`
+        how atomic vectors are converted, see `call`.
+
+        Pass `cache=True` (or a `ResultCache`, which can be shared between runners) to memoize
+        `call` results in memory. Cache hits skip both the R call and the conversion to pandas.
+        Pass a `DiskResultStore` to also share results with other processes through disk.
+
+        Pass a `SchemaRegistry` to store the dtypes of each function's data.frames the
+        first time it is called, and cast later results straight to them.
+
+        Pass `arg_cache=True` (or a `ConversionCache`, which can be shared between runners)
+        to reuse the R conversions of DataFrame and NumPy array arguments across calls.
+
+        Pass `RSessionSnapshots` to restore the sourced script from a snapshot saved by an
+        earlier process instead of sourcing it, as long as neither the sourced files nor
+        renv.lock changed.
+
+        With `hot_reload=True`, every call first checks the modification times of the
+        script and of the files it sources, and re-sources only the files that changed
+        (see `reload`), so edits to the R code are picked up without a new runner. Calls
+        that go through the cache or disk store always do this check, so they never
+        return results of an older version of the files.
+        """
+        if not script_path.exists():
+            raise FileNotFoundError(f"R script not found: {script_path}")
+
+        if path_to_renv:
+            self.path_to_renv = path_to_renv.resolve()
+        elif path_to_renv is None:
+            self.path_to_renv = None
+        self.script_path = script_path.resolve()
+        self.script_dir = self.script_path.parent
+        self.cache = ResultCache() if cache is True else (cache or None)
+        self.store = store
+        self.backend = _check_backend(backend)
+        self.schemas = schemas
+        if vectors not in _VECTOR_MODES:
+            raise ValueError(
+                f"Unknown vectors mode '{vectors}', expected one of {_VECTOR_MODES}"
+            )
+        self.vectors = vectors
+        self.arg_cache = ConversionCache() if arg_cache is True else (arg_cache or None)
+        self.snapshots = snapshots
+        self.hot_reload = hot_reload
+
+        self._load_script()
+
+    def _load_script(self):
+        """
+        Set the R working directory and load the R script into its own environment,
+        reusing the one from the script registry if the script was already sourced.
+        """
+        with _R_LOCK:
+            if self.path_to_renv:
+                activate_renv(self.path_to_renv)
+
+            # Set the working directory to the script's directory
+            robjects.r(f'setwd("{self.script_dir.as_posix()}")')
+            _source_script(self.script_path, self.snapshots, self._lock_hash())
+
+    def _lock_hash(self) -> str | None:
+        """
+        Return the hash of the renv.lock of the runner's renv project, if any.
+        """
+        if self.path_to_renv and (self.path_to_renv / "renv.lock").exists():
+            return _file_hash(self.path_to_renv / "renv.lock")
+        return None
+
+    @property
+    def env(self):
+        """
+        The R environment the script was sourced into, shared by all runners of the script.
+        """
+        return _script_envs[self.script_path][0]
+
+    @property
+    def _script_hash(self) -> str:
+        # Covers the files the script sources too, so cached results of an old version
+        # of any of them are never returned
+        with _R_LOCK:
+            return _sources_hash(_script_sources[self.script_path])
+
+    def reload(self) -> list[Path]:
+        """
+        Re-source the files of the script that changed since they were sourced, and return
+        them.
+
+        Modification times of the script and of every file it sourced (transitively) are
+        checked first, and only files whose contents changed are re-sourced, into the
+        environment they were originally sourced into. Objects the script computed from
+        them at its top level are not recomputed. If the script itself changed, or a
+        changed file was sourced somewhere else (e.g. inside a function), the whole script
+        is sourced again into a fresh environment.
+        """
+        with _R_LOCK:
+            sources = _script_sources[self.script_path]
+            changed = _changed_sources(sources)
+            if not changed:
+                return []
+
+            robjects.r(f'setwd("{self.script_dir.as_posix()}")')
+            if self.script_path in changed or any(
+                sources[path]["target"] not in ("script", "global") for path in changed
+            ):
+                del _script_envs[self.script_path]
+                _source_script(self.script_path, self.snapshots, self._lock_hash())
+            else:
+                env = self.env
+                for path in changed:
+                    if sources[path]["target"] == "script":
+                        target = env
+                    else:
+                        target = robjects.globalenv
+                    sources.update(_source_tracked(path, target, env)[0])
+        print(f"[Info] Reloaded changed R files: {', '.join(p.name for p in changed)}")
+        return changed
+
+    def _find_function(self, function_name: str):
+        """
+        Look up an R function in the script's environment, falling back to its parents
+        (e.g. for functions of files the script explicitly sources into globalenv).
+        Raises KeyError if there is no such function. The caller must hold `_R_LOCK`.
+        """
+        return self.env.find(function_name, wantfun=True)
+
+    def invalidate_cache(self, function_name: str | None = None):
+        """
+        Drop this runner's cached results, optionally only for one R function.
+        """
+        if self.cache is not None:
+            self.cache.invalidate(function_name, script_path=self.script_path)
+
+    def call(
+        self,
+        function_name: str,
+        *args,
+        backend: str | None = None,
+        schema: dict | None = None,
+        lazy: bool = False,
+        vectors: str | None = None,
+        convert: bool = True,
+        **kwargs,
+    ):
+        """
+        Call an R function from the sourced script, and recursively convert & post-process the result.
+        Handles:
+        - Direct data.frame
+        - NamedList or ListVector
+        - Nested lists with data.frames inside
+
+        `backend` overrides the runner's data.frame conversion backend for this call:
+        - "pandas2ri": rpy2's pandas converter.
+        - "arrow": an Arrow IPC stream written by R's `arrow` package and read by pyarrow,
+          which avoids per-element conversion for wide tables. Row names are dropped.
+
+        `vectors` overrides how the runner converts atomic R vectors for this call:
+        - "list": Python lists, or dicts for named vectors.
+        - "numpy": NumPy arrays, or pandas Series for named vectors, copied straight from
+          R's memory (see `r_vector_to_numpy`). Much faster for long vectors such as
+          lists of patient IDs.
+
+        `schema` gives the dtypes to cast the result to instead of inferring them, as
+        {column: dtype} for a data.frame result or {name: {column: dtype}} for data.frames
+        in a named list. Without it, the schema stored in the runner's `SchemaRegistry` is
+        used, if any. Columns that don't match the schema are reported as drift and inferred.
+
+        With `lazy=True` a named list result is returned as a `LazyRResult` mapping, which
+        converts and post-processes each element only when it is first accessed. Lazy
+        results skip the cache and disk store, and don't store schemas.
+
+        With `convert=False` the result is not converted at all but kept in R and returned
+        as an `RHandle`, which can be passed as an argument to later calls without any
+        conversion, and converted with the options of this call by `.to_pandas()`. Handles
+        skip the cache and disk store; release them to free the R object.
+
+        If the runner has a cache and/or a disk store, results are looked up there first by
+        function name, arguments and the contents of the script and the files it sources.
+        Changed files are re-sourced first (see `reload`). Calls with arguments that can't
+        be hashed are neither cached nor stored.
+
+        `backend`, `schema`, `lazy`, `vectors` and `convert` are options of this method and
+        are never passed on to R, so they shadow R parameters of the same name. Pass such
+        an argument positionally, or through `call_many`, which takes R keyword arguments
+        as a dict.
+        """
+        if self.hot_reload:
+            self.reload()
+        backend = _check_backend(backend or self.backend)
+        schema = _normalize_schema(schema)
+        vectors = vectors or self.vectors
+        options = {"backend": backend, "schema": schema, "vectors": vectors}
+        if lazy or not convert or (self.cache is None and self.store is None):
+            return self._call(
+                function_name, args, kwargs, lazy=lazy, convert=convert, **options
+            )
+
+        # Cache keys cover the sourced files as they were sourced, so pick up edits first
+        # even without hot_reload, or results of the old code would keep being returned
+        if not self.hot_reload:
+            self.reload()
+
+        try:
+            key = (
+                str(self.script_path),
+                function_name,
+                self._script_hash,
+                _stable_hash((args, kwargs, backend, schema, vectors)),
+            )
+        except TypeError:
+            return self._call(function_name, args, kwargs, **options)
+
+        if self.cache is not None:
+            result = self.cache.get(key)
+            if result is not _CACHE_MISS:
+                return _copy_result(result)
+
+        if self.store is not None:
+            result = self.store.get_or_call(
+                key, lambda: self._call(function_name, args, kwargs, **options)
+            )
+        else:
+            result = self._call(function_name, args, kwargs, **options)
+
+        if self.cache is not None:
+            self.cache.set(key, _copy_result(result))
+        return result
+
+    def call_iter(
+        self,
+        function_name: str,
+        *args,
+        chunksize: int = 100_000,
+        backend: str | None = None,
+        schema: dict | None = None,
+        **kwargs,
+    ):
+        """
+        Call an R function that returns a data.frame, and yield it as post-processed pandas
+        DataFrames of up to `chunksize` rows, e.g. to write them to Parquet one by one.
+
+        The result stays in R and is converted one slice of rows at a time, so the pandas
+        side only ever holds one chunk instead of a full copy of the table. Chunks keep
+        their row positions in a continuing RangeIndex (unless the data.frame has row
+        names). All chunks are cast to the same dtypes: those of `schema` (see `call`), of
+        the runner's `SchemaRegistry`, or else those inferred for the first chunk. Later
+        chunks that don't fit them are inferred on their own and reported as drift. A
+        schema inferred here is only stored in the `SchemaRegistry` once every chunk has
+        been yielded without drift. Results are not cached.
+
+        Like in `call`, `chunksize`, `backend` and `schema` shadow R parameters of the same
+        name; pass those positionally.
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        if self.hot_reload:
+            self.reload()
+        backend = _check_backend(backend or self.backend)
+        schema = _normalize_schema(schema)
+        to_pandas = (
+            r_dataframe_to_pandas_arrow if backend == "arrow" else r_dataframe_to_pandas
+        )
+
+        known = schema
+        if known is None and self.schemas is not None:
+            known = self.schemas.get(self.script_path, function_name)
+        frame_schema = known.get("") if known is not None else None
+
+        try:
+            with _R_LOCK:
+                result = self._call_r(function_name, args, kwargs)
+                if not _is_r_dataframe(result):
+                    raise TypeError("call_iter needs a function returning a data.frame")
+                n_rows = int(robjects.r("nrow")(result)[0])
+                # Classes and NAs of the full table, so every chunk gets the same dtypes
+                column_info = _r_column_info(result)
+        except KeyError:
+            raise ValueError(f"Function '{function_name}' not found in the R script.")
+        except Exception as e:
+            raise RuntimeError(
+                f"Error calling R function '{function_name}': {e}"
+            ) from e
+
+        drift = {}
+        for start in range(0, n_rows, chunksize):
+            stop = min(start + chunksize, n_rows)
+            with _R_LOCK:
+                chunk = to_pandas(
+                    _get_r_slice_rows()(result, start + 1, stop), column_info
+                )
+
+            if frame_schema is None:
+                raw = _r_column_raw(chunk)
+                chunk = postprocess_r_dataframe(chunk)
+                frame_schema = r_frame_schema(chunk, raw)
+            else:
+                chunk, changes = apply_r_schema(
+                    chunk, frame_schema, strict=schema is None
+                )
+                drift.update(dict.fromkeys(changes))
+
+            if isinstance(chunk.index, pd.RangeIndex):
+                chunk.index = pd.RangeIndex(start, stop)
+            yield chunk
+
+        if drift:
+            drift = {"": list(drift)}
+            if self.schemas is not None and schema is None and known is not None:
+                self.schemas.report_drift(
+                    self.script_path, function_name, drift, {"": frame_schema}
+                )
+            else:
+                print(f"[Warning] {_format_drift(function_name, drift)}")
+        elif self.schemas is not None and known is None and frame_schema is not None:
+            # Only store a schema inferred from the first chunk once every chunk fit it
+            self.schemas.set(self.script_path, function_name, {"": frame_schema})
+
+    def call_many(
+        self,
+        calls: list[tuple],
+        backend: str | None = None,
+        vectors: str | None = None,
+    ) -> list:
+        """
+        Run several independent R function calls in a single R evaluation and return their
+        converted results, in order.
+
+        `calls` holds `(function_name, args, kwargs)` tuples; args and kwargs may be left
+        out. All arguments are converted first, then one R evaluation runs every call and
+        collects the results in one R list, which is converted in one pass with the
+        runner's (or the given) `backend` and `vectors`, and any stored schemas.
+
+        A call that fails doesn't abort the batch: its place in the returned list holds
+        the exception instead (ValueError for an unknown function, RuntimeError for an R
+        error), like `call` would have raised. Results are not cached.
+
+        Example Usage
+        -------------
+        edc_df, eot_err = runner.call_many(
+            [
+                ("pull_edc_master", ("6236-001",), {"edc_table": "edc_overview"}),
+                ("pull_edc_master", ("6236-001",), {"edc_table": "edc_eot"}),
+            ]
+        )
+        """
+        if self.hot_reload:
+            self.reload()
+        backend = _check_backend(backend or self.backend)
+        vectors = vectors or self.vectors
+        calls = [
+            (
+                call[0],
+                tuple(call[1]) if len(call) > 1 else (),
+                dict(call[2]) if len(call) > 2 else {},
+            )
+            for call in calls
+        ]
+        results = [None] * len(calls)
+
+        with _R_LOCK:
+            batch = []
+            for i, (function_name, args, kwargs) in enumerate(calls):
+                try:
+                    r_func = self._find_function(function_name)
+                except KeyError:
+                    results[i] = ValueError(
+                        f"Function '{function_name}' not found in the R script."
+                    )
+                    continue
+                try:
+                    r_args, r_kwargs = self._args_to_r(args, kwargs)
+                except (RuntimeError, TypeError, ValueError) as e:
+                    # Unconvertible arguments (NotImplementedError is a RuntimeError),
+                    # R errors and released handles
+                    results[i] = RuntimeError(
+                        f"Error calling R function '{function_name}': {e}"
+                    )
+                    continue
+                r_call_args = rvectors.ListVector(
+                    [("", arg) for arg in r_args] + list(r_kwargs.items())
+                )
+                batch.append(
+                    (i, rvectors.ListVector([("fn", r_func), ("args", r_call_args)]))
+                )
+
+            r_results = []
+            if batch:
+                r_results = _get_r_call_many()(
+                    rvectors.ListVector([("", c) for _, c in batch])
+                )
+            outcomes = [
+                (r_result.rx2("ok")[0], r_result.rx2("value")) for r_result in r_results
+            ]
+
+        for (i, _), (ok, value) in zip(batch, outcomes):
+            function_name = calls[i][0]
+            if not ok:
+                results[i] = RuntimeError(
+                    f"Error calling R function '{function_name}': {value[0]}"
+                )
+                continue
+            try:
+                results[i] = self._convert_result(
+                    function_name, value, backend, vectors=vectors
+                )
+            except (OSError, RuntimeError, TypeError, ValueError) as e:
+                # Conversion errors, schema drift with on_drift="raise" and schema files
+                # that can't be read
+                results[i] = e
+        return results
+
+    async def acall(
+        self, function_name: str, *args, timeout: float | None = None, **kwargs
+    ):
+        """
+        Coroutine version of `call` that doesn't block the event loop while R runs.
+
+        The call is queued on the process-wide R thread, so concurrent `acall`s (and `call`s
+        from other threads) run one at a time instead of entering R together. If `timeout`
+        seconds pass, or the awaiting task is cancelled, a call that is still queued is
+        dropped. A call that has already started in R can't be interrupted: it runs to
+        completion and its result is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            _get_r_executor(),
+            functools.partial(self.call, function_name, *args, **kwargs),
+        )
+        return await asyncio.wait_for(future, timeout)
+
+    def _call_r(self, function_name: str, args: tuple, kwargs: dict):
+        """
+        Convert the arguments and call the R function, returning the unconverted R result.
+        The caller must hold `_R_LOCK`.
+        """
+        r_func = self._find_function(function_name)
+        r_args, r_kwargs = self._args_to_r(args, kwargs)
+        return r_func(*r_args, **r_kwargs)
+
+    def _args_to_r(self, args: tuple, kwargs: dict) -> tuple[list, dict]:
+        """
+        Convert call arguments to R. `RHandle` arguments are passed as the R objects they
+        hold, without conversion, and DataFrame and array arguments go through the
+        runner's `ConversionCache`, if any. The caller must hold `_R_LOCK`.
+        """
+
+        def _to_r(arg):
+            if isinstance(arg, RHandle):
+                return arg.robj
+            if self.arg_cache is not None and isinstance(
+                arg, (pd.DataFrame, np.ndarray)
+            ):
+                return self.arg_cache.convert(arg)
+            return robjects.conversion.py2rpy(arg)
+
+        with rconversion.localconverter(
+            robjects.default_converter + pandas2ri.converter
+        ):
+            r_args = [_to_r(arg) for arg in args]
+            r_kwargs = {k: _to_r(v) for k, v in kwargs.items()}
+        return r_args, r_kwargs
+
+    def _call(
+        self,
+        function_name: str,
+        args: tuple,
+        kwargs: dict,
+        backend: str = "pandas2ri",
+        schema: dict | None = None,
+        lazy: bool = False,
+        vectors: str = "list",
+        convert: bool = True,
+    ):
+        """
+        Call the R function and convert the result, without caching.
+        """
+        try:
+            with _R_LOCK:
+                # Keep the result in R so the column classes of data.frames can be
+                # read before they are converted
+                result = self._call_r(function_name, args, kwargs)
+
+                # Pin the result in R and convert it only on request
+                if not convert:
+                    return RHandle(
+                        result,
+                        functools.partial(
+                            self._convert_result,
+                            function_name,
+                            backend=backend,
+                            schema=schema,
+                            vectors=vectors,
+                        ),
+                    )
+        except KeyError:
+            raise ValueError(f"Function '{function_name}' not found in the R script.")
+        except Exception as e:
+            raise RuntimeError(
+                f"Error calling R function '{function_name}': {e}"
+            ) from e
+
+        return self._convert_result(
+            function_name, result, backend, schema, lazy=lazy, vectors=vectors
+        )
+
+    def _convert_result(
+        self,
+        function_name: str,
+        result,
+        backend: str = "pandas2ri",
+        schema: dict | None = None,
+        lazy: bool = False,
+        vectors: str = "list",
+    ):
+        """
+        Convert and post-process the R result of a call, and store or check its schema.
+        """
+        known = schema
+        if known is None and self.schemas is not None:
+            known = self.schemas.get(self.script_path, function_name)
+        inferred = {}
+        drift = {}
+
+        def _postprocess_frame(df, frame):
+            raw = _r_column_raw(df)
+            if known is not None and frame in known:
+                df, changes = apply_r_schema(df, known[frame], strict=schema is None)
+                if changes:
+                    drift[frame] = changes
+            else:
+                df = postprocess_r_dataframe(df)
+                if known is not None:
+                    drift[frame] = ["new data.frame"]
+            inferred[frame] = r_frame_schema(df, raw)
+            return df
+
+        def _recursive_postprocess(obj, path=()):
+            # Walk nested containers with an explicit stack instead of recursion, so
+            # deep nesting doesn't hit Python's recursion limit
+            root = [obj]
+            stack = [(root, 0, path)]
+            while stack:
+                parent, key, path = stack.pop()
+                obj = parent[key]
+
+                # Handle single DataFrame
+                if isinstance(obj, pd.DataFrame):
+                    parent[key] = _postprocess_frame(obj, "/".join(path))
+
+                # Handle dictionary (e.g. NamedList converted)
+                elif isinstance(obj, dict):
+                    parent[key] = container = dict(obj)
+                    stack.extend((container, k, path + (str(k),)) for k in container)
+
+                # Handle list of items
+                elif isinstance(obj, list):
+                    parent[key] = container = list(obj)
+                    stack.extend(
+                        (container, i, path + (str(i),)) for i in range(len(container))
+                    )
+
+                # Replace R NA_Character scalars with np.nan
+                elif hasattr(ro, "NA_Character") and obj is ro.NA_Character:
+                    parent[key] = np.nan
+
+                # Primitive values stay as-is
+            return root[0]
+
+        try:
+            # Everything that touches R must hold the lock; post-processing doesn't
+            with _R_LOCK:
+                # Leave the elements of a named list in R until they are accessed
+                if (
+                    lazy
+                    and not _is_r_dataframe(result)
+                    and _r_names(result) is not None
+                ):
+
+                    def _convert_element(name, element):
+                        with _R_LOCK:
+                            py_element = _convert_r_result(element, backend, vectors)
+                        py_element = _recursive_postprocess(py_element, (name,))
+                        if drift:
+                            print(f"[Warning] {_format_drift(function_name, drift)}")
+                            drift.clear()
+                        return py_element
+
+                    return LazyRResult(result, _convert_element)
+
+                # Step 1: Convert data.frames, R containers and other R objects
+                py_result = _convert_r_result(result, backend, vectors)
+
+            # Step 2: Recursively process any nested frames
+            py_result = _recursive_postprocess(py_result)
+
+        except Exception as e:
+            raise RuntimeError(f"Error calling R function '{function_name}': {e}")
+
+        # Step 3: Store the schema of a first call, or report drift from a known one
+        if schema is not None:
+            if drift:
+                print(f"[Warning] {_format_drift(function_name, drift)}")
+        elif self.schemas is not None and inferred:
+            if known is None:
+                self.schemas.set(self.script_path, function_name, inferred)
+            elif drift:
+                self.schemas.report_drift(
+                    self.script_path, function_name, drift, inferred
+                )
+        return py_result
+
+
+# %%
+# Runs a list of list(fn, args) calls, catching the error of each call separately
+_R_CALL_MANY = """
+function(calls) lapply(calls, function(call) {
+    tryCatch(
+        list(ok = TRUE, value = do.call(call$fn, call$args)),
+        error = function(e) list(ok = FALSE, value = conditionMessage(e))
+    )
+})
+"""
+
+
+@functools.cache
+def _get_r_call_many():
+    return robjects.r(_R_CALL_MANY)
+
+
+# %%
+# Runners owned by an RWorkerPool worker process, keyed by resolved script path
+_worker_runners = {}
+
+
+def _init_worker(
+    path_to_renv: Path | None,
+    script_paths: list[Path],
+    snapshot_root: Path | None = None,
+):
+    """
+    Start R in an RWorkerPool worker: activate renv and source (or restore) each script
+    once.
+    """
+    snapshots = RSessionSnapshots(snapshot_root) if snapshot_root else None
+    for script_path in script_paths:
+        # activate_renv is a no-op after the first runner, but every runner needs the
+        # renv.lock hash to validate its snapshot
+        _worker_runners[script_path] = RScriptRunner(
+            path_to_renv, script_path, snapshots=snapshots
+        )
+
+
+def _worker_call(script_path: Path, function_name: str, args: tuple, kwargs: dict):
+    """
+    Run a call on one of this worker's runners.
+    """
+    return _worker_runners[script_path].call(function_name, *args, **kwargs)
+
+
+def _worker_timed_call(
+    script_path: Path, function_name: str, args: tuple, kwargs: dict
+) -> tuple:
+    """
+    Run a call on one of this worker's runners, and also return how long it took.
+    """
+    start = time.perf_counter()
+    result = _worker_call(script_path, function_name, args, kwargs)
+    return result, time.perf_counter() - start
+
+
+class RWorkerPool:
+    """
+    A pool of worker processes, each with its own embedded R session, so that independent
+    R calls can run in parallel.
+
+    rpy2 embeds a single R interpreter per process, so calls on an `RScriptRunner` always run
+    one after another. Each worker of the pool activates renv and sources the scripts once
+    when it starts, then serves calls. Results are post-processed in the worker and sent back
+    to the parent pickled.
+
+    Example Usage
+    -------------
+    with RWorkerPool(path_to_renv, [edc_script, scan_script], n_workers=4) as pool:
+        edc_future = pool.submit(
+            "pull_edc_master", compound_study="6236-001", script_path=edc_script
+        )
+        scan_future = pool.submit("pull_scan", "6236-001", script_path=scan_script)
+        edc_df, scan_df = edc_future.result(), scan_future.result()
+    """
+
+    def __init__(
+        self,
+        path_to_renv: Path | None,
+        script_paths: Path | list[Path],
+        n_workers: int | None = None,
+        snapshots: RSessionSnapshots | None = None,
+    ):
+        """
+        Start `n_workers` worker processes (default: number of CPUs) for the given scripts.
+        Set path_to_renv to None if no renv is used. With `snapshots`, workers restore the
+        scripts from their snapshots when they are still valid instead of sourcing them.
+        """
+        if isinstance(script_paths, Path):
+            script_paths = [script_paths]
+        for script_path in script_paths:
+            if not script_path.exists():
+                raise FileNotFoundError(f"R script not found: {script_path}")
+
+        self.path_to_renv = path_to_renv.resolve() if path_to_renv else None
+        self.script_paths = [script_path.resolve() for script_path in script_paths]
+        self.n_workers = n_workers or os.cpu_count() or 1
+
+        # Workers must start a fresh R, so never fork a process that may already embed one
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                self.path_to_renv,
+                self.script_paths,
+                snapshots.root if snapshots else None,
+            ),
+        )
+
+    def submit(
+        self, function_name: str, *args, script_path: Path | None = None, **kwargs
+    ) -> Future:
+        """
+        Schedule an R function call on a worker and return a Future for its result.
+        `script_path` selects the script the function comes from (default: the first one).
+        """
+        script_path = (
+            Path(script_path).resolve() if script_path else self.script_paths[0]
+        )
+        if script_path not in self.script_paths:
+            raise ValueError(f"R script not loaded in this pool: {script_path}")
+        return self._executor.submit(
+            _worker_call, script_path, function_name, args, kwargs
+        )
+
+    def call(
+        self, function_name: str, *args, script_path: Path | None = None, **kwargs
+    ):
+        """
+        Run an R function call on a worker and wait for its result.
+        """
+        return self.submit(
+            function_name, *args, script_path=script_path, **kwargs
+        ).result()
+
+    async def acall(
+        self,
+        function_name: str,
+        *args,
+        script_path: Path | None = None,
+        timeout: float | None = None,
+        **kwargs,
+    ):
+        """
+        Coroutine version of `call`. A call that is still queued is dropped on timeout or
+        cancellation; one already running in a worker finishes and its result is discarded.
+        """
+        future = asyncio.wrap_future(
+            self.submit(function_name, *args, script_path=script_path, **kwargs)
+        )
+        return await asyncio.wait_for(future, timeout)
+
+    def fan_out(
+        self,
+        function_name: str,
+        param_sets: list[dict],
+        *args,
+        script_path: Path | None = None,
+        key: str | None = None,
+        progress: bool = True,
+        **kwargs,
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run the same R function once per parameter set in parallel, e.g. one pull per
+        `compound_study`, and concatenate the results into one DataFrame.
+
+        Each parameter set is a dict of keyword arguments, passed along with `args` and the
+        shared `kwargs` (the parameter set wins where both give an argument). Every
+        result is tagged with its parameters as leading columns (unless it already has a
+        column of that name), and the results are concatenated with `concat_r_frames`, so
+        a column gets the same dtype for every study. If the function returns a named
+        list, `key` selects the data.frame to use from it.
+
+        Returns the concatenated DataFrame and a DataFrame of per-call timings, with the
+        parameters, the seconds spent in the worker, the number of rows and the error of
+        calls that failed. Failed calls are left out of the result instead of aborting
+        the others. With `progress=True` each call is reported as it finishes.
+
+        Example Usage
+        -------------
+        with RWorkerPool(path_to_renv, edc_script, n_workers=4) as pool:
+            edc_df, timings = pool.fan_out(
+                "pull_edc_master",
+                [{"compound_study": study} for study in ["6236-001", "6236-002"]],
+                edc_table="edc_overview",
+            )
+        """
+        script_path = (
+            Path(script_path).resolve() if script_path else self.script_paths[0]
+        )
+        if script_path not in self.script_paths:
+            raise ValueError(f"R script not loaded in this pool: {script_path}")
+
+        futures = {
+            self._executor.submit(
+                _worker_timed_call,
+                script_path,
+                function_name,
+                args,
+                {**kwargs, **params},
+            ): i
+            for i, params in enumerate(param_sets)
+        }
+        frames = [None] * len(param_sets)
+        timings = [None] * len(param_sets)
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            params = param_sets[i]
+            label = ", ".join(f"{k}={v}" for k, v in params.items())
+            timing = {**params, "seconds": np.nan, "rows": np.nan, "error": None}
+            try:
+                result, timing["seconds"] = future.result()
+                if key is not None:
+                    result = result[key]
+                if not isinstance(result, pd.DataFrame):
+                    raise TypeError(
+                        f"expected a data.frame, got {type(result).__name__}"
+                    )
+            except (LookupError, RuntimeError, TypeError, ValueError) as e:
+                # Errors of the R call (wrapped in RuntimeError or ValueError), a broken
+                # worker process, or a result without a data.frame under `key`
+                timing["error"] = str(e)
+                print(f"[Warning] {function_name}({label}) failed: {e}")
+            else:
+                frame = result.copy()
+                for position, (name, value) in enumerate(params.items()):
+                    if name not in frame.columns:
+                        if not pd.api.types.is_scalar(value):
+                            value = str(value)
+                        frame.insert(position, name, value)
+                frames[i] = frame
+                timing["rows"] = len(frame)
+                if progress:
+                    print(
+                        f"[Info] {n_done}/{len(param_sets)} {function_name}({label}): "
+                        f"{len(frame)} rows in {timing['seconds']:.1f}s"
+                    )
+            timings[i] = timing
+
+        combined = concat_r_frames([frame for frame in frames if frame is not None])
+        return combined, pd.DataFrame(timings)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the worker processes.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
 
 
 # %%
-def activate_renv(path_to_renv: Path):
-    """
-    Activates the renv environment using renv::load() to ensure the correct project is loaded.
-    This avoids sourcing activate.R directly and avoids accidentally initializing a new environment.
+class LazyRResult(Mapping):
     """
+    Read-only mapping over the named list returned by `RScriptRunner.call(lazy=True)`.
 
-    renv_project_dir = path_to_renv.resolve()
-    renv_activate = renv_project_dir / "renv" / "activate.R"
-    renv_lock = renv_project_dir / "renv.lock"
+    Elements stay in R until they are first accessed, then are converted and
+    post-processed the same way `call` would and cached. Once every element has been
+    converted, the R list itself is released. Use `to_dict()` to convert everything.
+    """
 
-    if not renv_activate.exists() or not renv_lock.exists():
-        raise FileNotFoundError(
-            f"[Error] renv environment not found or incomplete at: {renv_project_dir}"
-        )
+    def __init__(self, r_list, convert):
+        # Like r_namedlist_to_dict, skip unnamed elements and let later duplicates win
+        self._index = {name: i for i, name in enumerate(_r_names(r_list) or []) if name}
+        self._r_list = r_list
+        self._convert = convert
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        index = self._index[key]
+        with self._lock:
+            if key not in self._values:
+                with _R_LOCK:
+                    element = self._r_list[index]
+                self._values[key] = self._convert(key, element)
+                if len(self._values) == len(self._index):
+                    self._r_list = None
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def to_dict(self) -> dict:
+        """
+        Convert all elements and return them as a plain dictionary.
+        """
+        return {key: self[key] for key in self}
 
-    # Optional: set R_ENVIRON_USER if .Renviron exists
-    renviron_file = renv_project_dir / ".Renviron"
-    if renviron_file.is_file():
-        os.environ["R_ENVIRON_USER"] = str(renviron_file)
-        print("[Info] R_ENVIRON_USER set to:", renviron_file)
+    def __repr__(self):
+        pending = [key for key in self._index if key not in self._values]
+        return f"LazyRResult(converted={list(self._values)}, pending={pending})"
 
-    # Load the renv package
-    try:
-        robjects.r("library(renv)")
-    except Exception:
-        print("[Info] renv package not found in R. Attempting to install...")
-        robjects.r('install.packages("renv", repos="https://cloud.r-project.org")')
-        # Try loading again after installation
-        robjects.r("library(renv)")
-
-    # Load the renv environment using renv::load(path)
-    try:
-        print("Using R at:", robjects.r("R.home()")[0])
-        robjects.r(f'renv::load("{renv_project_dir.as_posix()}")')
-        print(f"[Info] renv environment loaded for project: {renv_project_dir}")
-    except Exception as e:
-        raise RuntimeError(f"[Error] Failed to load renv environment: {e}")
 
-    print(".libPaths()")
-    print(robjects.r(".libPaths()"))
+# %%
+@functools.cache
+def _get_handle_env():
+    """
+    Return the R environment that pins the objects held by `RHandle`s.
+    """
+    return robjects.r("new.env(parent = emptyenv())")
 
 
-# %%
-class RScriptRunner:
+class RHandle:
     """
-    A utility class to load and execute R functions from a specified R script using rpy2.
+    An R object returned by `RScriptRunner.call(convert=False)`, kept in R unconverted.
+
+    The object is pinned in a dedicated R environment so R doesn't collect it while the
+    handle is alive. Pass the handle as an argument to later calls to hand the object back
+    to R without converting it to pandas and back, and call `to_pandas()` to convert it
+    the way the original call would have.
+
+    Handles are reference counted: `retain()` adds a reference and `release()` drops one.
+    When the last one is dropped (or the handle is garbage collected) the object is
+    removed from the environment and R can free it. Handles are also context managers
+    that release on exit.
+
+    Example Usage
+    -------------
+    with runner.call("pull_edc_master", "6236-001", convert=False) as edc:
+        summary_df = runner.call("summarize_edc", edc)
+        edc_df = edc.to_pandas()
     """
 
-    def __init__(self, path_to_renv: Path | None, script_path: Path):
+    _counter = 0
+    _counter_lock = threading.Lock()
+
+    def __init__(self, robj, convert):
+        with RHandle._counter_lock:
+            RHandle._counter += 1
+            self.name = f".handle_{RHandle._counter}"
+        with _R_LOCK:
+            _get_handle_env()[self.name] = robj
+        self._convert = convert
+        self._refs = 1
+        self._lock = threading.Lock()
+
+    @property
+    def released(self) -> bool:
+        return self._refs == 0
+
+    @property
+    def robj(self):
         """
-        Initialize the RScriptRunner with the path to the renv environment and the R script.
-        Set path_to_renv to None if no renv is used.
+        The pinned R object.
         """
-        if not script_path.exists():
-            raise FileNotFoundError(f"R script not found: {script_path}")
-
-        if path_to_renv:
-            self.path_to_renv = path_to_renv.resolve()
-        elif path_to_renv is None:
-            self.path_to_renv = None
-        self.script_path = script_path.resolve()
-        self.script_dir = self.script_path.parent
+        if self.released:
+            raise RuntimeError(f"R object {self.name} has already been released")
+        with _R_LOCK:
+            return _get_handle_env()[self.name]
 
-        self._load_script()
-
-    def _load_script(self):
+    def to_pandas(self):
         """
-        Set the R working directory and source the R script.
+        Convert and post-process the R object, like the call that returned it would have.
+        The handle stays valid.
         """
-        if self.path_to_renv:
-            activate_renv(self.path_to_renv)
-
-        # Set the working directory to the script's directory
-        robjects.r(f'setwd("{self.script_dir.as_posix()}")')
-        robjects.r(f'source("{self.script_path.as_posix()}")')
-        print(f"[Info] R script sourced: {self.script_path.name}")
+        return self._convert(self.robj)
 
-    def call(self, function_name: str, *args, **kwargs):
+    def retain(self) -> "RHandle":
         """
-        Call an R function from the sourced script, and recursively convert & post-process the result.
-        Handles:
-        - Direct data.frame
-        - NamedList or ListVector
-        - Nested lists with data.frames inside
+        Add a reference to the R object.
         """
+        with self._lock:
+            if self.released:
+                raise RuntimeError(f"R object {self.name} has already been released")
+            self._refs += 1
+        return self
 
-        def _recursive_postprocess(obj):
-            # Handle single DataFrame
-            if isinstance(obj, pd.DataFrame):
-                return postprocess_r_dataframe(obj)
-
-            # Handle dictionary (e.g. NamedList converted)
-            elif isinstance(obj, dict):
-                return {k: _recursive_postprocess(v) for k, v in obj.items()}
-
-            # Handle list of items
-            elif isinstance(obj, list):
-                return [_recursive_postprocess(item) for item in obj]
-
-            return obj  # Primitive values stay as-is
-
-        try:
-            r_func = robjects.globalenv[function_name]
+    def release(self):
+        """
+        Drop a reference to the R object, and free it once no references are left.
+        """
+        with self._lock:
+            if self.released:
+                return
+            self._refs -= 1
+            if self._refs == 0:
+                self._free()
 
-            with localconverter(robjects.default_converter + pandas2ri.converter):
-                r_args = [robjects.conversion.py2rpy(arg) for arg in args]
-                r_kwargs = {k: robjects.conversion.py2rpy(v) for k, v in kwargs.items()}
-                result = r_func(*r_args, **r_kwargs)
+    def _free(self):
+        with _R_LOCK:
+            robjects.baseenv["rm"](list=self.name, envir=_get_handle_env())
 
-            # Step 1: Try direct conversion
-            with localconverter(robjects.default_converter + pandas2ri.converter):
-                py_result = robjects.conversion.rpy2py(result)
+    def __enter__(self):
+        return self
 
-            # Step 2: If it's still an R container, convert it
-            if isinstance(py_result, (NamedList, ListVector)):
-                py_result = r_namedlist_to_dict(py_result)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
-            # Step 3: Recursively process any nested frames
-            return replace_r_na(_recursive_postprocess(py_result))
+    def __del__(self):
+        # Nothing can use an unreachable handle, so free it whatever its count
+        if getattr(self, "_refs", 0) > 0:
+            self._refs = 0
+            # R may already be shut down at interpreter exit
+            with suppress(Exception):
+                self._free()
 
-        except KeyError:
-            raise ValueError(f"Function '{function_name}' not found in the R script.")
-        except Exception as e:
-            raise RuntimeError(f"Error calling R function '{function_name}': {e}")
+    def __repr__(self):
+        state = "released" if self.released else f"refs={self._refs}"
+        return f"RHandle({self.name}, {state})"
 
 
 # %%
-def r_namedlist_to_dict(namedlist):
+def r_namedlist_to_dict(namedlist, backend: str = "pandas2ri", vectors: str = "list"):
     """
     Recursively convert an R NamedList or ListVector to a Python dictionary.
-    - Unwrap atomic R vectors (StrVector, IntVector, etc.) into Python lists or dicts if named.
-    - Convert data.frames to pandas DataFrames.
+    - Unwrap atomic R vectors (StrVector, IntVector, etc.) into Python lists or dicts if named,
+      or with vectors="numpy" into NumPy arrays or pandas Series if named (see
+      `r_vector_to_numpy`).
+    - Convert data.frames to pandas DataFrames, with pandas2ri or through Arrow if
+      backend="arrow".
     - Handles NULL or unnamed cases gracefully.
+
+    Nested lists are walked with an explicit stack, so deep nesting doesn't hit Python's
+    recursion limit.
     """
+    if vectors not in _VECTOR_MODES:
+        raise ValueError(
+            f"Unknown vectors mode '{vectors}', expected one of {_VECTOR_MODES}"
+        )
 
-    # -------------------------------------------
-    # Handle named lists (NamedList or ListVector)
-    # -------------------------------------------
-    if isinstance(namedlist, (NamedList, ListVector)):
-        names = namedlist.names if not callable(namedlist.names) else namedlist.names()
-        result = {}
-
-        # Only iterate if names is not NULL
-        if not isinstance(names, NULLType):
-            for key, value in zip(names, namedlist):
-                key_str = (
-                    str(key)
-                    if key is not None and not isinstance(key, NULLType)
-                    else None
-                )
-                if key_str:
-                    result[key_str] = r_namedlist_to_dict(value)
-            return result
+    root = [None]
+    # (R object, container to put its conversion in, key in that container)
+    stack = [(namedlist, root, 0)]
+    while stack:
+        obj, parent, key = stack.pop()
+
+        # data.frames are also ListVectors, so catch them before the list handling below
+        if _is_r_dataframe(obj):
+            if backend == "arrow":
+                parent[key] = r_dataframe_to_pandas_arrow(obj)
+            else:
+                parent[key] = r_dataframe_to_pandas(obj)
+            continue
+
+        # -------------------------------------------
+        # Handle named lists (NamedList or ListVector)
+        # -------------------------------------------
+        if isinstance(obj, (rlc.NamedList, rvectors.ListVector)):
+            names = _r_names(obj)
+
+            # Only use names if they are not NULL, skipping unnamed elements. Later
+            # duplicates win, at the position of the first one
+            if names is not None:
+                items = {}
+                for name, value in zip(names, obj):
+                    if name:
+                        items[name] = value
+                container = dict.fromkeys(items)
+            # If no names, fallback to a list
+            else:
+                items = dict(enumerate(obj))
+                container = [None] * len(items)
+
+            parent[key] = container
+            stack.extend((value, container, k) for k, value in items.items())
+            continue
 
-        # If no names, fallback to a list
-        return [r_namedlist_to_dict(value) for value in namedlist]
+        parent[key] = _r_vector_to_python(obj, vectors)
+    return root[0]
 
+
+_VECTOR_MODES = ("list", "numpy")
+
+
+# Atomic vectors that r_vector_to_numpy can convert (factors are not IntVectors in rpy2)
+@functools.cache
+def _numpy_vector_types() -> tuple:
+    return (
+        rvectors.FactorVector,
+        rvectors.StrVector,
+        rvectors.IntVector,
+        rvectors.FloatVector,
+        rvectors.BoolVector,
+    )
+
+
+def _r_vector_to_python(obj, vectors: str = "list"):
+    """
+    Convert an atomic R vector or other non-list R object for `r_namedlist_to_dict`.
+    """
     # -------------------------------------------
     # Handle atomic vectors (StrVector, IntVector, etc.)
     # These may have names (e.g., c(a = 1, b = 2)) — if so, return a dict.
     # Otherwise, convert to plain Python list.
     # -------------------------------------------
-    if isinstance(namedlist, (StrVector, IntVector, FloatVector, BoolVector)):
-        names = namedlist.names if not callable(namedlist.names) else namedlist.names()
-        if not isinstance(names, NULLType):
+    if vectors == "numpy" and isinstance(obj, _numpy_vector_types()):
+        return r_vector_to_numpy(obj)
+    if isinstance(
+        obj,
+        (
+            rvectors.StrVector,
+            rvectors.IntVector,
+            rvectors.FloatVector,
+            rvectors.BoolVector,
+        ),
+    ):
+        names = obj.names if not callable(obj.names) else obj.names()
+        if not isinstance(names, rsexp.NULLType):
             return {
                 str(n): v
-                for n, v in zip(names, list(namedlist))
-                if n is not None and not isinstance(n, NULLType)
+                for n, v in zip(names, list(obj))
+                if n is not None and not isinstance(n, rsexp.NULLType)
             }
-        return list(namedlist)
+        return list(obj)
 
     # -------------------------------------------
     # Attempt conversion via pandas2ri — works for data.frames, tibbles, etc.
     # If it fails, fall back to returning the original R object.
     # -------------------------------------------
-    with localconverter(robjects.default_converter + pandas2ri.converter):
+    with rconversion.localconverter(robjects.default_converter + pandas2ri.converter):
         try:
-            return robjects.conversion.rpy2py(namedlist)
+            return robjects.conversion.rpy2py(obj)
         except Exception:
-            return namedlist
+            return obj
+
+
+def r_vector_to_numpy(vector) -> np.ndarray | pd.Series:
+    """
+    Convert an atomic R vector to a NumPy array, or a pandas Series indexed by the names
+    of a named vector.
+
+    Numeric and logical vectors are copied straight from R's memory instead of one
+    element at a time, and NAs are found in one vectorized pass:
+    - integer: int32, or float64 with NaN if there are NAs
+    - double: float64 (NA is already NaN)
+    - logical: bool, or object with np.nan if there are NAs
+    - character: object, with np.nan for NA
+    - factor: pandas Categorical of the levels
+    """
+    with _R_LOCK:
+        if isinstance(vector, rvectors.FactorVector):
+            codes = np.array(vector.memoryview(), dtype=np.int64)
+            levels = [str(level) for level in vector.levels]
+            # R codes start at 1 and NA is the integer sentinel; pandas uses -1 for NA
+            codes = np.where(codes == _R_NA_INTEGER, -1, codes - 1)
+            values = pd.Categorical.from_codes(codes, categories=levels)
+        elif isinstance(vector, rvectors.StrVector):
+            values = np.array(list(vector), dtype=object)
+            na = np.array(robjects.baseenv["is.na"](vector).memoryview(), dtype=bool)
+            if na.any():
+                values[na] = np.nan
+        elif isinstance(vector, (rvectors.IntVector, rvectors.BoolVector)):
+            values = np.array(vector.memoryview())
+            na = values == _R_NA_INTEGER
+            if isinstance(vector, rvectors.BoolVector):
+                values = values.astype(bool)
+                if na.any():
+                    values = values.astype(object)
+                    values[na] = np.nan
+            elif na.any():
+                values = np.where(na, np.nan, values.astype(np.float64))
+        elif isinstance(vector, rvectors.FloatVector):
+            values = np.array(vector.memoryview(), dtype=np.float64)
+        else:
+            raise TypeError(f"Not an atomic R vector: {type(vector).__name__}")
+
+        names = vector.names if not callable(vector.names) else vector.names()
+        if isinstance(names, rsexp.NULLType):
+            return values
+        index = [str(name) for name in names]
+    return pd.Series(values, index=index)
+
+
+def _convert_r_result(result, backend: str = "pandas2ri", vectors: str = "list"):
+    """
+    Convert an R object returned by a function to Python, before post-processing.
+    The caller must hold `_R_LOCK`.
+    """
+    # Data.frames and R containers
+    if _is_r_dataframe(result) or isinstance(
+        result, (rlc.NamedList, rvectors.ListVector)
+    ):
+        return r_namedlist_to_dict(result, backend=backend, vectors=vectors)
+
+    # Atomic vectors, if they should become NumPy arrays
+    if vectors == "numpy" and isinstance(result, _numpy_vector_types()):
+        return r_vector_to_numpy(result)
+
+    # Otherwise try direct conversion
+    with rconversion.localconverter(robjects.default_converter + pandas2ri.converter):
+        return robjects.conversion.rpy2py(result)
+
+
+def _r_names(obj) -> list[str] | None:
+    """
+    Return the names of an R list as strings ("" for missing names), or None if it is
+    not a list or has no names.
+    """
+    if not isinstance(obj, (rlc.NamedList, rvectors.ListVector)):
+        return None
+    names = obj.names if not callable(obj.names) else obj.names()
+    if isinstance(names, rsexp.NULLType):
+        return None
+    return [
+        str(name) if name is not None and not isinstance(name, rsexp.NULLType) else ""
+        for name in names
+    ]
+
+
+# %%
+# Reads the class and whether there are NAs for every column of a data.frame in one call
+_R_COLUMN_INFO = """
+function(df) list(
+    classes = vapply(df, function(x) paste(class(x), collapse = " "), character(1),
+                     USE.NAMES = FALSE),
+    any_na = vapply(df, anyNA, logical(1), USE.NAMES = FALSE)
+)
+"""
+
+
+@functools.cache
+def _get_r_column_info():
+    return robjects.r(_R_COLUMN_INFO)
+
+
+def _r_column_info(r_df) -> tuple[list[str], list[bool]]:
+    """
+    Return the R class (e.g. "integer", "Date", "POSIXct POSIXt", "factor") and whether
+    the column has any NA, for every column of an unconverted R data.frame.
+    """
+    with _R_LOCK:
+        info = _get_r_column_info()(r_df)
+        classes = [str(c) for c in info.rx2("classes")]
+        any_na = [bool(x) for x in info.rx2("any_na")]
+    return classes, any_na
+
+
+def _attach_r_column_info(df: pd.DataFrame, classes: list[str], any_na: list[bool]):
+    """
+    Store the R column info in `df.attrs` for `postprocess_r_dataframe`, if it still
+    lines up with the converted columns.
+    """
+    if len(classes) == df.shape[1]:
+        df.attrs["r_column_classes"] = classes
+        df.attrs["r_column_any_na"] = any_na
+    return df
+
+
+def r_dataframe_to_pandas(r_df, column_info: tuple | None = None) -> pd.DataFrame:
+    """
+    Convert an R data.frame to pandas with pandas2ri.
+
+    The R class of every column is read before the conversion and kept in
+    `df.attrs["r_column_classes"]`, so `postprocess_r_dataframe` can restore Dates,
+    integers with NA, integer64 etc. from the class instead of guessing from the values.
+
+    `column_info` gives the (classes, any_na) of `_r_column_info` instead of reading them
+    from `r_df`, e.g. those of the full data.frame when converting a slice of its rows.
+    """
+    with _R_LOCK:
+        classes, any_na = column_info or _r_column_info(r_df)
+        with rconversion.localconverter(
+            robjects.default_converter + pandas2ri.converter
+        ):
+            df = robjects.conversion.rpy2py(r_df)
+    if not isinstance(df, pd.DataFrame):
+        return df
+
+    # pandas2ri hands over bit64::integer64 columns as the raw bits of a double vector
+    for i, r_class in enumerate(classes[: df.shape[1]]):
+        if "integer64" in r_class.split() and df.dtypes.iloc[i] == np.float64:
+            df.isetitem(i, _integer64_from_bits(df.iloc[:, i]))
+    _harmonize_r_na_columns(df, classes, any_na)
+    return _attach_r_column_info(df, classes, any_na)
+
+
+def _integer64_from_bits(series: pd.Series) -> pd.Series:
+    """
+    Reinterpret a float64 column holding bit64::integer64 values as int64 (float64 with
+    NaN if there are NAs, like other integer columns with NA).
+    """
+    values = series.to_numpy().view(np.int64)
+    na = values == _R_NA_INTEGER64
+    if na.any():
+        values = np.where(na, np.nan, values.astype(np.float64))
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _harmonize_r_na_columns(df: pd.DataFrame, classes: list[str], any_na: list[bool]):
+    """
+    Give integer64 and logical columns that have NAs the dtype they convert to with NAs
+    (float64, and object with np.nan), in place, even if `df` holds only rows without
+    any. Slices of one data.frame then all come out with the same dtypes.
+    """
+    if len(classes) != df.shape[1]:
+        return
+    for i, (r_class, has_na) in enumerate(zip(classes, any_na)):
+        series = df.iloc[:, i]
+        if not has_na:
+            continue
+        if r_class == "integer64" and pd.api.types.is_integer_dtype(series):
+            na = series.to_numpy() == _R_NA_INTEGER64
+            df.isetitem(i, series.astype("float64").mask(na))
+        elif r_class == "logical" and not pd.api.types.is_object_dtype(series):
+            processed = _postprocess_r_column_by_class(series, ["logical"], True)
+            if processed is not None:
+                df.isetitem(i, processed)
+
+
+# Rows start..stop (1-based, inclusive) of a data.frame. Automatic row names are
+# dropped so the slice doesn't carry "start".."stop" as string row names
+_R_SLICE_ROWS = """
+function(df, start, stop) {
+    chunk <- df[seq.int(start, stop), , drop = FALSE]
+    if (.row_names_info(df) < 0L) rownames(chunk) <- NULL
+    chunk
+}
+"""
+
+
+@functools.cache
+def _get_r_slice_rows():
+    return robjects.r(_R_SLICE_ROWS)
+
+
+def r_dataframe_to_pandas_arrow(r_df, column_info: tuple | None = None) -> pd.DataFrame:
+    """
+    Convert an R data.frame to pandas through Arrow instead of pandas2ri.
+
+    R's `arrow` package writes the data.frame column by column into a single raw vector in
+    Arrow IPC stream format, which pyarrow reads in place through the buffer protocol, so
+    no values are converted one element at a time. Factors become pandas Categoricals,
+    Dates and POSIXct become datetime64[ns] columns, and row names are dropped.
+    Requires the `arrow` R package and `pyarrow`.
+
+    Missing values in object columns (character, logical with NA) are np.nan and integer
+    NAs are R's NA_integer_ sentinel as with pandas2ri, so both backends give the same
+    dtypes and values after post-processing. `column_info` is as in
+    `r_dataframe_to_pandas`.
+    """
+    import pyarrow as pa
+
+    with _R_LOCK:
+        classes, any_na = column_info or _r_column_info(r_df)
+        write_to_raw = robjects.r("arrow::write_to_raw")
+        raw = write_to_raw(clean_r_dataframe(r_df), format="stream")
+        table = pa.ipc.open_stream(pa.py_buffer(raw.memoryview())).read_all()
+    return _arrow_table_to_pandas(table, classes, any_na)
+
+
+def _arrow_table_to_pandas(table, classes: list[str], any_na: list[bool]):
+    """
+    Convert an Arrow table written by R's `arrow` package to pandas, with the same dtypes
+    and NAs as `r_dataframe_to_pandas`.
+    """
+    import pyarrow as pa
+
+    # Integer NAs as the NA_integer_ sentinel, so the column stays int32 like in pandas2ri
+    for i, column in enumerate(table.columns):
+        if pa.types.is_int32(column.type) and column.null_count:
+            table = table.set_column(
+                i,
+                table.field(i),
+                column.fill_null(pa.scalar(_R_NA_INTEGER, pa.int32())),
+            )
+    df = table.to_pandas(date_as_object=False, coerce_temporal_nanoseconds=True)
+
+    # Arrow nulls come back as None in object columns
+    for i, has_na in enumerate(any_na[: df.shape[1]]):
+        column = df.iloc[:, i]
+        if has_na and pd.api.types.is_object_dtype(column):
+            df.isetitem(i, column.mask(column.isna().to_numpy(), np.nan))
+    _harmonize_r_na_columns(df, classes, any_na)
+    return _attach_r_column_info(df, classes, any_na)
+
+
+# Builds a data.frame from a list of columns without copying them, like
+# data.frame(..., check.names = FALSE) but without coercing anything
+_R_AS_DATA_FRAME = """
+function(columns, n_rows, row_names) {
+    attr(columns, "row.names") <- if (is.null(row_names)) .set_row_names(n_rows) else row_names
+    class(columns) <- "data.frame"
+    columns
+}
+"""
+
+
+@functools.cache
+def _get_r_as_data_frame():
+    return robjects.r(_R_AS_DATA_FRAME)
+
+
+def numpy_to_r_vector(values: np.ndarray):
+    """
+    Convert a 1-D numeric or boolean NumPy array to an R vector by copying its buffer,
+    instead of converting one element at a time. Floats become doubles (NaN stays NaN),
+    integers that fit become integers and other integers doubles, and booleans logicals.
+    Other arrays are converted with pandas2ri.
+    """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    with _R_LOCK:
+        if kind == "f":
+            return rvectors.FloatVector(
+                rinterface.FloatSexpVector.from_memoryview(
+                    memoryview(np.ascontiguousarray(values, dtype=np.float64))
+                )
+            )
+        if kind in "iu":
+            fits = values.size == 0 or (
+                values.min() > _R_NA_INTEGER and values.max() <= np.iinfo(np.int32).max
+            )
+            if not fits:
+                return numpy_to_r_vector(values.astype(np.float64))
+            return rvectors.IntVector(
+                rinterface.IntSexpVector.from_memoryview(
+                    memoryview(np.ascontiguousarray(values, dtype=np.int32))
+                )
+            )
+        if kind == "b":
+            return rvectors.BoolVector(
+                rinterface.BoolSexpVector.from_memoryview(
+                    memoryview(np.ascontiguousarray(values, dtype=np.int32))
+                )
+            )
+        with rconversion.localconverter(
+            robjects.default_converter + pandas2ri.converter
+        ):
+            return robjects.conversion.py2rpy(values)
+
+
+def _strings_to_r_factor(series: pd.Series):
+    """
+    Convert a string column to an R factor from its pandas codes, or return None if it
+    has too many distinct values (or non-string values) for a factor to pay off.
+    """
+    codes, levels = pd.factorize(series, sort=True)
+    if len(levels) > max(1, len(series) // 2) or not all(
+        isinstance(level, str) for level in levels
+    ):
+        return None
+    # R codes start at 1, and NA is the integer sentinel instead of -1
+    codes = np.where(codes < 0, _R_NA_INTEGER, codes + 1).astype(np.int32)
+    with _R_LOCK:
+        factor = rvectors.IntVector(
+            rinterface.IntSexpVector.from_memoryview(memoryview(codes))
+        )
+        factor.do_slot_assign("levels", rvectors.StrVector(list(levels)))
+        factor.do_slot_assign("class", rvectors.StrVector(["factor"]))
+        return rvectors.FactorVector(factor)
+
+
+def pandas_to_r_dataframe(df: pd.DataFrame, factor_strings: bool = False):
+    """
+    Convert a pandas DataFrame to an R data.frame, building numeric and boolean columns
+    directly from their NumPy buffers (see `numpy_to_r_vector`). Other columns (strings,
+    dates, nullable and categorical dtypes) are converted with pandas2ri. With
+    `factor_strings=True`, string columns with few distinct values become R factors.
+
+    The index becomes row names unless it is a default RangeIndex.
+    """
+    columns = []
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        column = None
+        if not isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            if series.dtype.kind in "fiub":
+                column = numpy_to_r_vector(series.to_numpy())
+            elif series.dtype == object and factor_strings:
+                column = _strings_to_r_factor(series)
+        if column is None:
+            with (
+                _R_LOCK,
+                rconversion.localconverter(
+                    robjects.default_converter + pandas2ri.converter
+                ),
+            ):
+                column = robjects.conversion.py2rpy(series)
+        columns.append(column)
+
+    row_names = None
+    if not (
+        isinstance(df.index, pd.RangeIndex)
+        and df.index.start == 0
+        and df.index.step == 1
+    ):
+        row_names = rvectors.StrVector([str(label) for label in df.index])
+
+    with _R_LOCK:
+        r_columns = rvectors.ListVector(
+            [(str(name), column) for name, column in zip(df.columns, columns)]
+        )
+        return _get_r_as_data_frame()(
+            r_columns, len(df), row_names if row_names is not None else robjects.NULL
+        )
+
+
+def _is_r_dataframe(obj) -> bool:
+    """
+    Return True if `obj` is an (unconverted) R data.frame, including tibbles.
+    """
+    rclass = getattr(obj, "rclass", None)
+    return rclass is not None and "data.frame" in tuple(rclass)
+
+
+def _check_backend(backend: str) -> str:
+    if backend not in ("pandas2ri", "arrow"):
+        raise ValueError(
+            f"Unknown conversion backend '{backend}', use 'pandas2ri' or 'arrow'."
+        )
+    return backend
 
 
 # %%
@@ -255,7 +2699,17 @@ def replace_r_na(obj):
 
 
 # %%
-def normalize_single_df_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_single_df_dtypes(
+    df: pd.DataFrame, sample_size: int | None = 1000
+) -> pd.DataFrame:
+    """
+    Replace string NAs with pd.NA, convert object columns that are mostly numeric to
+    numeric, and cast integer columns with NA to float.
+
+    Whether a column is mostly numeric is first decided on a sample of `sample_size`
+    non-null values (see `_coerce_mostly_numeric`); pass None to always check the full
+    column.
+    """
     df = df.replace(["", "nan", "NaN", "NA", "na"], pd.NA)
 
     for col in df.columns:
@@ -263,9 +2717,8 @@ def normalize_single_df_dtypes(df: pd.DataFrame) -> pd.DataFrame:
 
         # Try converting object/string columns to numeric if possible
         if pd.api.types.is_object_dtype(series):
-            coerced = pd.to_numeric(series, errors="coerce")
-            # Replace column if conversion produced fewer NaNs (meaning more numeric)
-            if coerced.notna().sum() >= series.notna().sum() * 0.5:
+            coerced = _coerce_mostly_numeric(series, sample_size)
+            if coerced is not None:
                 df[col] = coerced
 
         # Cast integer columns with NA to float to accommodate pd.NA
@@ -276,6 +2729,34 @@ def normalize_single_df_dtypes(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _coerce_mostly_numeric(series: pd.Series, sample_size: int | None = 1000):
+    """
+    Return `series` converted with `pd.to_numeric` if at least half of its non-null
+    values are numeric, else None.
+
+    With more than `sample_size` non-null values, the share of numeric values is first
+    estimated on a random sample of that size, and a column that is clearly not numeric
+    (a share more than 4 standard errors below 50%) is rejected without converting it.
+    Any other column is converted in full and the 50% threshold is checked on the full
+    result, so columns near the threshold are always decided on all of their values.
+    """
+    n_valid = series.notna().sum()
+    if sample_size is not None and n_valid > sample_size:
+        values = series.to_numpy()
+        valid = np.flatnonzero(pd.notna(values))
+        # Fixed seed so the same column is always decided the same way
+        rng = np.random.default_rng(0)
+        sample = values[valid[rng.integers(0, len(valid), sample_size)]]
+        share = pd.to_numeric(pd.Series(sample), errors="coerce").notna().mean()
+        if share < 0.5 - 2 / np.sqrt(sample_size):
+            return None
+
+    coerced = pd.to_numeric(series, errors="coerce")
+    if coerced.notna().sum() >= n_valid * 0.5:
+        return coerced
+    return None
+
+
 # %%
 def fix_r_dataframe_types(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -312,12 +2793,232 @@ def fix_r_dataframe_types(df: pd.DataFrame) -> pd.DataFrame:
 
 
 # %%
-def postprocess_r_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    df = fix_r_dataframe_types(df)
-    df = fix_string_nans(df)
-    df = normalize_single_df_dtypes(df)
+# String values that are treated as missing in data.frames converted from R
+_NA_STRINGS = ["nan", "NaN", "NA", "na", ""]
+
+# R's NA_integer_ sentinel
+_R_NA_INTEGER = -2147483648
+
+# bit64's NA_integer64_ sentinel
+_R_NA_INTEGER64 = np.iinfo(np.int64).min
+
+
+def _postprocess_r_column(
+    series: pd.Series,
+    r_class: str | None = None,
+    any_na: bool = True,
+    sample_size: int | None = 1000,
+) -> pd.Series:
+    """
+    Post-process one column of a DataFrame converted from R.
+
+    If the column's R class is known (`r_class`, e.g. "Date" or "POSIXct POSIXt"), it is
+    used to set the dtype directly. Otherwise, or if the class doesn't settle it, this
+    gives the same result as running the column through `fix_r_dataframe_types`,
+    `fix_string_nans`, `normalize_single_df_dtypes` and `replace_r_na` in turn, but skips
+    the steps that can't apply to the column's dtype. Returns `series` itself if nothing
+    changed.
+    """
+    if r_class is not None:
+        processed = _postprocess_r_column_by_class(
+            series, r_class.split(), any_na, sample_size
+        )
+        if processed is not None:
+            return processed
+
+    original = series
+
+    # Fix R's NA_integer_ sentinel (-2147483648)
+    if pd.api.types.is_integer_dtype(original):
+        sentinel = original.to_numpy() == _R_NA_INTEGER
+        if sentinel.any():
+            series = original.mask(sentinel, pd.NA)
+
+    # Convert R-style date columns (days since 1970) to datetime
+    if pd.api.types.is_numeric_dtype(original):
+        values = original.dropna()
+        if not values.empty and values.min() >= 10000 and values.max() <= 40000:
+            try:
+                # "1970-01-01" is the reference date for Unix Epoch
+                series = pd.to_datetime("1970-01-01") + pd.to_timedelta(
+                    original, unit="D"
+                )
+            except (TypeError, ValueError, OverflowError):
+                pass  # e.g. complex values aren't dates
+        if pd.api.types.is_integer_dtype(series) and series.isna().any():
+            series = series.astype("float64")
+        return series
+
+    # Remove timezone from datetime columns (e.g., POSIXct with tz)
+    if isinstance(original.dtype, pd.DatetimeTZDtype):
+        return original.dt.tz_localize(None)
+    if pd.api.types.is_datetime64_dtype(original):
+        return original
+
+    if not pd.api.types.is_object_dtype(original):
+        # e.g. categoricals: fall back to the same full replace as the original steps
+        series = original.replace(_NA_STRINGS, pd.NA)
+        if hasattr(ro, "NA_Character"):
+            series = series.replace({ro.NA_Character: np.nan}, regex=False)
+        return series
+
+    return _postprocess_r_strings(original, sample_size=sample_size)
+
+
+def _postprocess_r_column_by_class(
+    series: pd.Series, classes: list[str], any_na: bool, sample_size: int | None = 1000
+) -> pd.Series | None:
+    """
+    Post-process a column using its R class. Returns None if the class doesn't settle
+    the dtype (e.g. factors, lists, unknown classes, or an unexpected converted dtype),
+    in which case the value heuristics are used instead.
+    """
+    is_numeric = pd.api.types.is_numeric_dtype(series)
+
+    if "Date" in classes:
+        if is_numeric:
+            # Days since the Unix Epoch (1970-01-01), NA becomes NaT
+            return pd.to_datetime("1970-01-01") + pd.to_timedelta(series, unit="D")
+        if pd.api.types.is_datetime64_dtype(series):
+            return series
+        return None
+
+    if "POSIXct" in classes:
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            return series.dt.tz_localize(None)
+        if pd.api.types.is_datetime64_dtype(series):
+            return series
+        return None
+
+    if classes == ["integer"] or classes == ["integer64"]:
+        if not is_numeric:
+            return None
+        # A column with NAs is float64 even in a slice of rows without any
+        if any_na and pd.api.types.is_integer_dtype(series):
+            sentinel = _R_NA_INTEGER if classes == ["integer"] else _R_NA_INTEGER64
+            na = series.to_numpy() == sentinel
+            series = series.astype("float64").mask(na)
+        return series
+
+    if classes == ["numeric"]:
+        return series if is_numeric else None
+
+    if classes == ["logical"]:
+        if pd.api.types.is_bool_dtype(series) and not any_na:
+            return series
+        # bool, or True/False with np.nan if there are NAs, like r_vector_to_numpy. A
+        # column with NAs is object even in a slice of rows without any
+        values = series.to_numpy()
+        if pd.api.types.is_bool_dtype(series):
+            na = series.isna().to_numpy()
+        elif pd.api.types.is_integer_dtype(series):
+            na = values == _R_NA_INTEGER
+        elif pd.api.types.is_object_dtype(series):
+            na = np.array([not isinstance(v, (bool, np.bool_)) for v in values], bool)
+        else:
+            return None
+        values = np.where(na, False, values).astype(bool)
+        if any_na:
+            values = values.astype(object)
+            values[na] = np.nan
+        return pd.Series(values, index=series.index, name=series.name)
+
+    if classes == ["character"] and pd.api.types.is_object_dtype(series):
+        return _postprocess_r_strings(series, r_na=any_na, sample_size=sample_size)
+
+    return None
+
+
+def _postprocess_r_strings(
+    series: pd.Series,
+    r_na: bool = True,
+    numeric: bool = True,
+    sample_size: int | None = 1000,
+) -> pd.Series:
+    """
+    Post-process an object column: replace string NAs, convert it to numeric if at least
+    half of the values are numeric (only tried if `numeric`, first on a sample of
+    `sample_size` values), and replace R's NA_Character with np.nan (only looked for if
+    `r_na`).
+    """
+    original = series
+
+    # Replace common string versions of NA/NaN with actual pd.NA. Like replace(), let the
+    # column take a non-object dtype if only e.g. floats are left
+    na_strings = original.isin(_NA_STRINGS).to_numpy()
+    if na_strings.any():
+        series = original.mask(na_strings, pd.NA).infer_objects()
+        if not pd.api.types.is_object_dtype(series):
+            return series
+
+    # Try converting to numeric, and keep it if at least half of the values are numeric
+    if numeric:
+        coerced = _coerce_mostly_numeric(series, sample_size)
+        if coerced is not None:
+            return coerced
+
+    # Replace R NA_Character with np.nan
+    if r_na and hasattr(ro, "NA_Character"):
+        r_na_mask = series.eq(ro.NA_Character).to_numpy()
+        if r_na_mask.any():
+            series = series.mask(r_na_mask, np.nan).infer_objects()
+    return series
+
+
+def postprocess_r_dataframe(
+    df: pd.DataFrame, sample_size: int | None = 1000
+) -> pd.DataFrame:
+    """
+    Post-process a DataFrame converted from R via rpy2, one column at a time:
+    - Replaces R's NA_integer_ sentinel with NA (integer columns become float64)
+    - Converts numeric columns that represent R dates into datetime
+    - Converts timezone-aware datetimes to naive datetimes
+    - Replaces string NAs ("NA", "nan", "", ...) with pd.NA and R's NA_Character with np.nan
+    - Converts object columns that are mostly numeric to numeric
+    - Resets an R-style "1".."n" string index to a RangeIndex
+
+    This gives the same result as `fix_r_dataframe_types`, `fix_string_nans`,
+    `normalize_single_df_dtypes` and `replace_r_na` in sequence, but touches each column
+    once and only replaces the columns that change, instead of copying the whole frame
+    at every step. `df` is modified in place.
+
+    If the R column classes were recorded at conversion (`df.attrs["r_column_classes"]`,
+    set by `r_dataframe_to_pandas` and `r_dataframe_to_pandas_arrow`), columns of known
+    class (Date, POSIXct, integer, integer64, numeric, character) get their dtype from
+    the class, e.g. a numeric column of patient numbers is no longer mistaken for dates.
+    The value heuristics then only run for columns of other classes.
+
+    Whether an object column is mostly numeric is first decided on a sample of
+    `sample_size` non-null values (see `_coerce_mostly_numeric`); pass None to always
+    check the full column.
+    """
+    classes, any_na = _pop_r_column_info(df)
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        processed = _postprocess_r_column(series, classes[i], any_na[i], sample_size)
+        if processed is not series:
+            df.isetitem(i, processed)
+
+    _normalize_r_index(df)
+    return df
 
-    # Normalize R-style string index starting from "1"
+
+def _pop_r_column_info(df: pd.DataFrame) -> tuple[list, list]:
+    """
+    Remove and return the R column classes and NA flags recorded at conversion, or
+    placeholders if there are none.
+    """
+    classes = df.attrs.pop("r_column_classes", None)
+    any_na = df.attrs.pop("r_column_any_na", None)
+    if classes is None or len(classes) != df.shape[1]:
+        return [None] * df.shape[1], [True] * df.shape[1]
+    return classes, any_na
+
+
+def _normalize_r_index(df: pd.DataFrame):
+    """
+    Reset an R-style "1".."n" string index to a RangeIndex, in place.
+    """
     if df.index.dtype == object:
         try:
             int_index = df.index.astype(int)
@@ -325,7 +3026,137 @@ def postprocess_r_dataframe(df: pd.DataFrame) -> pd.DataFrame:
                 df.index = pd.RangeIndex(start=0, stop=len(df))
         except Exception:
             pass  # leave index as-is if not convertible
-    return df
+
+
+# %%
+def r_frame_schema(df: pd.DataFrame, raw: list[tuple] | None = None) -> dict:
+    """
+    Return the schema of a post-processed DataFrame as {column: entry} for a
+    `SchemaRegistry`. Each entry holds the final "dtype" and, if `raw` is given (the
+    (R class, dtype) pairs from `_r_column_raw` before post-processing), the "r_class"
+    and "raw" dtype the column had when it came out of R.
+    """
+    schema = {}
+    for i, (column, dtype) in enumerate(df.dtypes.items()):
+        entry = {"dtype": str(dtype)}
+        if raw is not None:
+            entry["r_class"], entry["raw"] = raw[i]
+        schema[str(column)] = entry
+    return schema
+
+
+def _r_column_raw(df: pd.DataFrame) -> list[tuple]:
+    """
+    Return (R class, dtype) for every column of a DataFrame that was just converted from R.
+    """
+    classes = df.attrs.get("r_column_classes")
+    if classes is None or len(classes) != df.shape[1]:
+        classes = [None] * df.shape[1]
+    return [(r_class, str(dtype)) for r_class, dtype in zip(classes, df.dtypes)]
+
+
+def apply_r_schema(
+    df: pd.DataFrame, schema: dict, strict: bool = True
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Post-process a DataFrame converted from R by casting it straight to a known schema
+    ({column: dtype} or {column: entry} as from `r_frame_schema`), without the
+    `to_numeric` trials and date heuristics of `postprocess_r_dataframe`.
+
+    Returns the DataFrame (modified in place) and a list of schema changes: new, missing
+    or retyped columns, and columns whose values don't fit the stored dtype. Those columns
+    are post-processed with the usual inference instead. With `strict=False` columns that
+    aren't in the schema are inferred without being reported.
+    """
+    classes, any_na = _pop_r_column_info(df)
+    changes = []
+    for i, (column, series) in enumerate(df.items()):
+        entry = schema.get(str(column))
+        if isinstance(entry, str):
+            entry = {"dtype": entry}
+
+        processed = None
+        if entry is None:
+            if strict:
+                changes.append(f"new column '{column}'")
+        elif "raw" in entry and (entry["r_class"], entry["raw"]) != (
+            classes[i],
+            str(series.dtype),
+        ):
+            changes.append(
+                f"column '{column}' came from R as {classes[i]} ({series.dtype}), "
+                f"expected {entry['r_class']} ({entry['raw']})"
+            )
+        else:
+            processed = _cast_r_column(series, entry["dtype"], any_na[i])
+            if processed is None:
+                changes.append(f"column '{column}' doesn't fit dtype {entry['dtype']}")
+
+        if processed is None:
+            processed = _postprocess_r_column(series, classes[i], any_na[i])
+        if processed is not series:
+            df.isetitem(i, processed)
+
+    columns = set(map(str, df.columns))
+    changes += [f"missing column '{c}'" for c in schema if c not in columns]
+
+    _normalize_r_index(df)
+    return df, changes
+
+
+def _cast_r_column(series: pd.Series, dtype: str, any_na: bool = True):
+    """
+    Cast a column converted from R to `dtype` (a dtype name such as "float64" or
+    "datetime64[ns]"), handling R's NAs and dates but without inferring anything from
+    the values. Returns None if the column can't be cast to it.
+    """
+    if dtype.startswith("datetime64"):
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            return series.dt.tz_localize(None)
+        if pd.api.types.is_datetime64_dtype(series):
+            return series
+        if pd.api.types.is_numeric_dtype(series):
+            # Days since the Unix Epoch (1970-01-01)
+            return pd.to_datetime("1970-01-01") + pd.to_timedelta(series, unit="D")
+        return None
+
+    if dtype == "object":
+        if not pd.api.types.is_object_dtype(series):
+            return None
+        return _postprocess_r_strings(series, r_na=any_na, numeric=False)
+
+    try:
+        target = pd.api.types.pandas_dtype(dtype)
+    except TypeError:
+        return None
+    if not pd.api.types.is_numeric_dtype(target) or pd.api.types.is_bool_dtype(target):
+        # e.g. categoricals and logicals: post-process as usual and check the result
+        processed = _postprocess_r_column(series)
+        return processed if str(processed.dtype) == dtype else None
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if any_na and pd.api.types.is_integer_dtype(series):
+            na = series.to_numpy() == _R_NA_INTEGER
+            if na.any():
+                series = series.astype("float64").mask(na)
+    elif pd.api.types.is_object_dtype(series):
+        na_strings = series.isin(_NA_STRINGS).to_numpy()
+        if na_strings.any():
+            series = series.mask(na_strings)
+        coerced = pd.to_numeric(series, errors="coerce")
+        # Same threshold as the inference: at least half of the values must be numeric
+        if coerced.notna().sum() < series.notna().sum() * 0.5:
+            return None
+        series = coerced
+    else:
+        return None
+
+    if series.dtype == target:
+        return series
+    try:
+        return series.astype(target)
+    except (TypeError, ValueError):
+        return None
 
 
 # %%
@@ -417,6 +3248,72 @@ def align_numeric_dtypes(df1, df2):
     return df1, df2
 
 
+# %%
+def _common_dtype(dtypes: list):
+    """
+    Return the dtype a column should have when frames with the given dtypes are stacked:
+    the shared dtype, the widest numeric or datetime dtype, a categorical with all
+    categories, or object otherwise.
+    """
+    first = dtypes[0]
+    if all(dtype == first for dtype in dtypes):
+        return first
+    if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+        categories = (
+            pd.Index([]).append([dtype.categories for dtype in dtypes]).unique()
+        )
+        return pd.CategoricalDtype(categories)
+    if all(isinstance(dtype, np.dtype) for dtype in dtypes) and (
+        all(dtype.kind in "iuf" for dtype in dtypes)
+        or all(dtype.kind == "M" for dtype in dtypes)
+    ):
+        return np.result_type(*dtypes)
+    return np.dtype(object)
+
+
+def concat_r_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate DataFrames returned by the same R function for different parameters
+    (e.g. one per study) so that every column has one consistent dtype.
+
+    Columns are ordered by first appearance. A column's dtype is decided only from the
+    frames where it has values, so a study where it is all NA (which R hands over as
+    logical or character) doesn't turn it into object. Integer and boolean columns that
+    are missing or NA somewhere become float64 and object. Mixed numeric dtypes are
+    widened, categoricals get the union of their categories, and anything else that
+    differs becomes object.
+    """
+    if not frames:
+        return pd.DataFrame()
+
+    columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+    targets = {}
+    for col in columns:
+        present = [frame[col] for frame in frames if col in frame.columns]
+        with_values = [series for series in present if series.notna().any()]
+        target = _common_dtype([s.dtype for s in (with_values or present)])
+        has_gaps = len(with_values) < len(frames)
+        if has_gaps and isinstance(target, np.dtype):
+            if target.kind in "iu":
+                target = np.dtype(np.float64)
+            elif target.kind == "b":
+                target = np.dtype(object)
+        targets[col] = target
+
+    aligned = []
+    for frame in frames:
+        casts = {
+            col: dtype
+            for col, dtype in targets.items()
+            if col in frame.columns and frame[col].dtype != dtype
+        }
+        aligned.append(frame.astype(casts) if casts else frame)
+    combined = pd.concat(aligned, ignore_index=True)
+    return combined[columns].astype(
+        {col: dtype for col, dtype in targets.items() if combined[col].dtype != dtype}
+    )
+
+
 # %%
 def compare_r_py_dataframes(df1, df2, float_tol=1e-8):
     """